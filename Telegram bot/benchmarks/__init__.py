@@ -0,0 +1,6 @@
+"""
+Пакет бенчмарков
+
+Запуск из корня бота, например:
+    python -m benchmarks.hot_paths --output results.json
+"""
\ No newline at end of file
@@ -0,0 +1,198 @@
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Сколько должен длиться один повтор при автоматическом подборе числа вызовов
+MIN_REPEAT_SECONDS = 0.05
+
+def prepare_environment(prefix: str = 'bench') -> str:
+    """
+    Готовит окружение до импорта модулей бота: фиктивный токен и временная БД.
+    Возвращает путь к файлу БД
+    """
+    if 'config' in sys.modules:
+        raise RuntimeError("prepare_environment() нужно вызывать до импорта config")
+    
+    db_dir = tempfile.mkdtemp(prefix=f'{prefix}-')
+    db_path = os.path.join(db_dir, 'bench.db')
+    
+    # Значения задаются явно: load_dotenv не перезаписывает окружение,
+    # поэтому настоящий токен и рабочая БД из .env не используются
+    os.environ['BOT_TOKEN'] = '123456:BENCHMARK'
+    os.environ['OWNER_ID'] = '1'
+    os.environ['DATABASE_NAME'] = db_path
+    os.environ.setdefault('DB_SLOW_QUERY_MS', '1000')
+    
+    logging.basicConfig(level=logging.WARNING)
+    return db_path
+
+def import_bot(api_url: str, overrides: Optional[list] = None):
+    """
+    Импортирует main.py так же, как при обычном запуске, но с сервером Bot API api_url.
+    overrides - строки KEY=VALUE для config.py. Вызывать после prepare_environment()
+    """
+    os.environ['BOT_API_URL'] = api_url
+    os.environ['BOT_MODE'] = 'polling'
+    os.environ['FLASK_PORT'] = '0'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    for item in overrides or ():
+        key, _, value = item.partition('=')
+        os.environ[key] = value
+    
+    import main
+    return main
+
+def start_bot(bot_main, api, timeout: float = 60):
+    """Запускает main.main() в фоне и ждет начала polling на стенде api"""
+    threading.Thread(target=bot_main.main, name='bot-main', daemon=True).start()
+    
+    # Бот готов, когда после снятия webhook (remove_webhook вызывает setWebhook) начался polling
+    if not api.wait_for('setWebhook', timeout=timeout) or not api.wait_for('getUpdates', 3, timeout=timeout):
+        raise SystemExit(f"Бот не запустился: {api.stats()}")
+
+def percentile(values: list, fraction: float) -> float:
+    """Перцентиль отсортированного списка"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, round(fraction * (len(values) - 1)))
+    return values[index]
+
+def latency_summary(latencies: list) -> dict:
+    """p50/p90/p99/max/mean для отсортированного списка задержек в мс"""
+    return {
+        'p50': round(percentile(latencies, 0.5), 1),
+        'p90': round(percentile(latencies, 0.9), 1),
+        'p99': round(percentile(latencies, 0.99), 1),
+        'max': round(latencies[-1], 1) if latencies else 0.0,
+        'mean': round(statistics.fmean(latencies), 1) if latencies else 0.0
+    }
+
+def _api_result(method_name: str, params: Optional[dict]):
+    params = params or {}
+    if method_name in ('sendMessage', 'editMessageText'):
+        return {
+            'message_id': int(time.time() * 1000) % 2147483647,
+            'date': int(time.time()),
+            'chat': {'id': int(params.get('chat_id', 0)), 'type': 'supergroup'},
+            'text': params.get('text', '')
+        }
+    if method_name == 'getMe':
+        return {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+    if method_name == 'getChatMember':
+        return {
+            'user': {'id': int(params.get('user_id', 0)), 'is_bot': False, 'first_name': 'User'},
+            'status': 'member'
+        }
+    if method_name == 'getChatAdministrators':
+        return []
+    return True
+
+@contextmanager
+def offline_api():
+    """
+    Отвечает на запросы Bot API готовыми результатами без сети,
+    чтобы замерялся только код бота
+    """
+    from telebot import apihelper
+    
+    original = apihelper._make_request
+    calls = {}
+
+    def _make_request(token, method_name, method='get', params=None, files=None):
+        calls[method_name] = calls.get(method_name, 0) + 1
+        return _api_result(method_name, params)
+    
+    apihelper._make_request = _make_request
+    try:
+        yield calls
+    finally:
+        apihelper._make_request = original
+
+def _time_loop(func: Callable, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+def calibrate(func: Callable) -> int:
+    """Подбирает число вызовов, чтобы один повтор длился не меньше MIN_REPEAT_SECONDS"""
+    number = 1
+    while True:
+        if _time_loop(func, number) >= MIN_REPEAT_SECONDS or number >= 1_000_000:
+            return number
+        number *= 10
+
+def bench(name: str, func: Callable, group: str = '', repeat: int = 7,
+          number: Optional[int] = None) -> dict:
+    """Замеряет func и возвращает время одного вызова в микросекундах"""
+    # Прогрев: кэши, ленивые загрузки, подготовленные запросы sqlite
+    func()
+    number = number or calibrate(func)
+    
+    per_call = [_time_loop(func, number) / number * 1e6 for _ in range(repeat)]
+    per_call.sort()
+    p95_index = min(len(per_call) - 1, round(0.95 * (len(per_call) - 1)))
+    
+    return {
+        'name': name,
+        'group': group,
+        'number': number,
+        'repeat': repeat,
+        'min_us': round(per_call[0], 3),
+        'median_us': round(statistics.median(per_call), 3),
+        'mean_us': round(statistics.fmean(per_call), 3),
+        'p95_us': round(per_call[p95_index], 3),
+        'ops_per_sec': round(1e6 / statistics.median(per_call), 1)
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+def environment_info() -> dict:
+    """Сведения о запуске, чтобы результаты разных релизов можно было сравнивать"""
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'sqlite': sqlite3.sqlite_version
+    }
+
+def write_results(suite: str, results: list, output: Optional[str] = None) -> dict:
+    """Печатает таблицу результатов и сохраняет их в JSON (если указан output)"""
+    report = {'suite': suite, 'environment': environment_info(), 'results': results}
+    
+    width = max(len(item['name']) for item in results) if results else 10
+    print(f"{'benchmark':<{width}}  {'median, мкс':>12}  {'p95, мкс':>10}  {'оп/с':>12}")
+    for item in results:
+        print(f"{item['name']:<{width}}  {item['median_us']:>12.3f}  {item['p95_us']:>10.3f}  {item['ops_per_sec']:>12.1f}")
+    
+    if output:
+        save_json(report, output)
+    return report
+
+def save_json(report: dict, output: str):
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
\ No newline at end of file
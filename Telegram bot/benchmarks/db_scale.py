@@ -0,0 +1,332 @@
+"""
+Бенчмарк запросов database.py на объемах рабочей БД, с индексами и без
+    
+    python -m benchmarks.db_scale --groups 10000 --vip 1000000 --mutes 500000 --output db.json
+    python -m benchmarks.db_scale --save-baseline      # сохранить результат как эталон
+    python -m benchmarks.db_scale --baseline old.json  # сравнить с другим эталоном
+
+Без --baseline результат сравнивается с benchmarks/baselines/db_scale.json, если он есть.
+При замедлении больше --threshold код возврата 1
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import prepare_environment, bench, environment_info, save_json
+
+# Заполнение БД заведомо дольше порога журнала медленных запросов
+os.environ.setdefault('DB_SLOW_QUERY_MS', '600000')
+DB_PATH = prepare_environment('db-scale')
+
+from database import db
+from config import OWNER_ID
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'db_scale.json')
+
+FIRST_GROUP_ID = -1004000000000
+FIRST_USER_ID = 1000000
+
+# Запросы в том виде, в котором их выполняют сервисы и обработчики:
+# (имя, компонент, SQL, функция параметров, изменяет ли данные)
+# Изменения откатываются после каждого вызова, чтобы объем данных не менялся
+QUERIES = [
+    ('subscription.stale_channel_groups', 'SubscriptionChecker', '''
+        SELECT DISTINCT group_id FROM channels
+        WHERE channel_username = ? AND (channel_id IS NULL OR channel_id != ?)
+    ''', lambda ctx: (ctx.channel(), '-1009999999999'), False),
+    ('subscription.update_channel_id', 'SubscriptionChecker', '''
+        UPDATE channels SET channel_id = ?
+        WHERE channel_username = ? AND (channel_id IS NULL OR channel_id != ?)
+    ''', lambda ctx: ('-1009999999999', ctx.channel(), '-1009999999999'), True),
+    ('group_policy.group', 'SubscriptionChecker',
+     'SELECT auto_del_time FROM groups WHERE group_id = ?',
+     lambda ctx: (ctx.group(),), False),
+    ('group_policy.channels', 'SubscriptionChecker', '''
+        SELECT channel_username, channel_id, check_until FROM channels
+        WHERE group_id = ? AND is_active = 1
+    ''', lambda ctx: (ctx.group(),), False),
+    ('language.chat_language', 'SubscriptionChecker', '''
+        SELECT language FROM chat_languages WHERE chat_id = ?
+    ''', lambda ctx: (ctx.group(),), False),
+    
+    ('vip_index.reload', 'VIPService', '''
+        SELECT id, user_id, username, vip_type, scope, group_id, end_date
+        FROM vip_users ORDER BY id
+    ''', lambda ctx: (), False),
+    
+    ('scheduler.next_channel', 'Scheduler', '''
+        SELECT MIN(check_until) FROM channels
+        WHERE check_until IS NOT NULL AND is_active = 1
+    ''', lambda ctx: (), False),
+    ('scheduler.next_vip', 'Scheduler',
+     'SELECT MIN(end_date) FROM vip_users WHERE end_date IS NOT NULL',
+     lambda ctx: (), False),
+    ('scheduler.next_mute', 'Scheduler',
+     'SELECT MIN(mute_end) FROM muted_users',
+     lambda ctx: (), False),
+    ('scheduler.expired_channels', 'Scheduler', '''
+        SELECT c.id, c.group_id, c.channel_username, c.check_until, g.group_title
+        FROM channels c
+        JOIN groups g ON c.group_id = g.group_id
+        WHERE c.check_until IS NOT NULL
+        AND c.check_until <= ?
+        AND c.is_active = 1
+    ''', lambda ctx: (ctx.now,), False),
+    ('scheduler.delete_expired_vip', 'Scheduler', '''
+        DELETE FROM vip_users
+        WHERE end_date IS NOT NULL AND end_date <= ?
+    ''', lambda ctx: (ctx.now,), True),
+    ('scheduler.expired_mutes', 'Scheduler', '''
+        SELECT user_id, group_id FROM muted_users
+        WHERE mute_end <= ?
+    ''', lambda ctx: (ctx.now,), False),
+    ('scheduler.delete_mute', 'Scheduler', '''
+        DELETE FROM muted_users
+        WHERE user_id = ? AND group_id = ?
+    ''', lambda ctx: ctx.mute(), True),
+    
+    ('status.selected_group', '/status', '''
+        SELECT selected_group_id FROM owner_selected_group WHERE owner_id = ?
+    ''', lambda ctx: (OWNER_ID,), False),
+    ('status.group', '/status',
+     'SELECT * FROM groups WHERE group_id = ?',
+     lambda ctx: (ctx.group(),), False),
+    ('status.channels', '/status', '''
+        SELECT * FROM channels WHERE group_id = ? AND is_active = 1
+    ''', lambda ctx: (ctx.group(),), False),
+    ('status.vips', '/status', '''
+        SELECT * FROM vip_users WHERE scope = 'local' AND group_id = ?
+        AND (end_date IS NULL OR end_date > ?)
+        UNION ALL
+        SELECT * FROM vip_users WHERE scope = 'global'
+        AND (end_date IS NULL OR end_date > ?)
+    ''', lambda ctx: (ctx.group(), ctx.now, ctx.now), False),
+    ('status.mutes', '/status', '''
+        SELECT * FROM muted_users WHERE group_id = ? AND mute_end > ?
+    ''', lambda ctx: (ctx.group(), ctx.now), False),
+]
+
+class Context:
+    """Параметры запросов: группы, каналы и муты перебираются по кругу"""
+
+    def __init__(self, args, seed: int):
+        rng = random.Random(seed)
+        self.now = datetime.now()
+        groups = [FIRST_GROUP_ID - rng.randrange(args.groups) for _ in range(1000)]
+        channels = [f'@channel_{rng.randrange(args.groups)}_{rng.randrange(args.channels)}' for _ in range(1000)]
+        mutes = []
+        for _ in range(1000):
+            i = rng.randrange(args.mutes)
+            mutes.append((FIRST_USER_ID + i, FIRST_GROUP_ID - i % args.groups))
+        self._groups = itertools.cycle(groups)
+        self._channels = itertools.cycle(channels)
+        self._mutes = itertools.cycle(mutes)
+
+    def group(self) -> int:
+        return next(self._groups)
+
+    def channel(self) -> str:
+        return next(self._channels)
+
+    def mute(self) -> tuple:
+        return next(self._mutes)
+
+def seed_database(args):
+    """Заполняет БД: доля истекших записей задается --expired-ratio"""
+    rng = random.Random(args.seed)
+    now = datetime.now()
+
+    def deadline(null_ratio: float):
+        roll = rng.random()
+        if roll < null_ratio:
+            return None
+        if roll < null_ratio + args.expired_ratio:
+            return now - timedelta(minutes=rng.randrange(1, 600))
+        return now + timedelta(minutes=rng.randrange(1, 60 * 24 * 30))
+    
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
+            VALUES (?, ?, ?, ?, 30)
+        ''', ((FIRST_GROUP_ID - i, f'Группа {i}', f'group_{i}', now) for i in range(args.groups)))
+        
+        cursor.executemany('''
+            INSERT INTO channels (channel_id, channel_username, group_id, added_date, check_until, is_active)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            (str(-1002000000000 - i * 10 - j), f'@channel_{i}_{j}', FIRST_GROUP_ID - i, now,
+             deadline(0.5), 1 if rng.random() < 0.8 else 0)
+            for i in range(args.groups) for j in range(args.channels)
+        ))
+        
+        cursor.executemany('''
+            INSERT INTO vip_users (user_id, username, vip_type, scope, group_id, start_date, end_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            (FIRST_USER_ID + i, f'user_{i}', 'VIP_PLUS' if i % 5 == 0 else 'VIP',
+             'global' if i % 10 == 0 else 'local',
+             None if i % 10 == 0 else FIRST_GROUP_ID - rng.randrange(args.groups),
+             now, deadline(0.2))
+            for i in range(args.vip)
+        ))
+        
+        cursor.executemany('''
+            INSERT INTO muted_users (user_id, username, group_id, mute_time, mute_end, violations)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            (FIRST_USER_ID + i, f'user_{i}', FIRST_GROUP_ID - i % args.groups, now,
+             deadline(0.0), 2 + i % 3)
+            for i in range(args.mutes)
+        ))
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO chat_languages (chat_id, language) VALUES (?, ?)
+        ''', ((FIRST_GROUP_ID - i, 'en' if i % 4 == 0 else 'ru') for i in range(args.groups)))
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO owner_selected_group (owner_id, selected_group_id) VALUES (?, ?)
+        ''', (OWNER_ID, FIRST_GROUP_ID))
+
+def drop_indexes(conn) -> list:
+    """Удаляет индексы из миграций (автоматические индексы PRIMARY KEY остаются)"""
+    names = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+        ).fetchall()
+    ]
+    for name in names:
+        conn.execute(f'DROP INDEX {name}')
+    conn.commit()
+    return names
+
+def run_phase(conn, phase: str, ctx: Context, args) -> list:
+    results = []
+    # Планы берутся в отдельном соединении: закэшированный EXPLAIN
+    # не перекомпилируется после удаления индексов и показывает старый план
+    plans = sqlite3.connect(DB_PATH)
+    for name, component, sql, make_params, writes in QUERIES:
+        if args.filter not in name:
+            continue
+
+        def run(sql=sql, make_params=make_params, writes=writes):
+            rows = conn.execute(sql, make_params(ctx)).fetchall()
+            if writes:
+                conn.rollback()
+            return rows
+        
+        plan = plans.execute(f'EXPLAIN QUERY PLAN {sql}', make_params(ctx)).fetchall()
+        
+        result = bench(f'{phase}:{name}', run, group=component, repeat=args.repeat)
+        result.update({
+            'phase': phase,
+            'query': name,
+            'plan': '; '.join(row[3] for row in plan)
+        })
+        results.append(result)
+        print(f"{phase:<10} {name:<32} {result['median_us']:>14.1f} мкс  {result['plan']}")
+    
+    plans.close()
+    return results
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """Запросы, которые стали медленнее эталона больше чем на threshold"""
+    reference = {item['name']: item for item in baseline.get('results', [])}
+    regressions = []
+    for item in results:
+        old = reference.get(item['name'])
+        if old is None or not old['median_us']:
+            continue
+        ratio = item['median_us'] / old['median_us']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'name': item['name'],
+                'baseline_us': old['median_us'],
+                'current_us': item['median_us'],
+                'ratio': round(ratio, 2)
+            })
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк запросов БД на больших объемах")
+    parser.add_argument('--groups', type=int, default=10000, help="Количество групп")
+    parser.add_argument('--channels', type=int, default=3, help="Каналов на группу")
+    parser.add_argument('--vip', type=int, default=1000000, help="Строк в vip_users")
+    parser.add_argument('--mutes', type=int, default=500000, help="Строк в muted_users")
+    parser.add_argument('--expired-ratio', type=float, default=0.02,
+                        help="Доля истекших сроков (их еще не удалил планировщик)")
+    parser.add_argument('--repeat', type=int, default=5, help="Количество повторов каждого замера")
+    parser.add_argument('--filter', default='', help="Запускать только запросы, содержащие строку")
+    parser.add_argument('--no-drop', action='store_true', help="Не замерять без индексов")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', help="Эталон для сравнения (по умолчанию baselines/db_scale.json)")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Допустимое замедление, доля")
+    parser.add_argument('--save-baseline', action='store_true', help="Сохранить результат как эталон")
+    parser.add_argument('--output', help="Файл для результатов в JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    
+    print(f"Заполнение БД: {args.groups} групп, {args.vip} VIP, {args.mutes} мутов...")
+    seed_database(args)
+    ctx = Context(args, args.seed)
+    
+    with db.get_connection() as conn:
+        results = run_phase(conn, 'indexed', ctx, args)
+        if not args.no_drop:
+            dropped = drop_indexes(conn)
+            print(f"Удалены индексы: {', '.join(dropped)}")
+            results += run_phase(conn, 'no_indexes', ctx, args)
+    
+    # Во сколько раз индексы ускоряют каждый запрос
+    by_name = {item['name']: item for item in results}
+    speedup = {}
+    for name, *_ in QUERIES:
+        indexed = by_name.get(f'indexed:{name}')
+        plain = by_name.get(f'no_indexes:{name}')
+        if indexed and plain and indexed['median_us']:
+            speedup[name] = round(plain['median_us'] / indexed['median_us'], 2)
+    
+    report = {
+        'suite': 'db_scale',
+        'environment': environment_info(),
+        'parameters': {key: value for key, value in vars(args).items()
+                       if key in ('groups', 'channels', 'vip', 'mutes', 'expired_ratio', 'seed')},
+        'results': results,
+        'index_speedup': speedup
+    }
+    
+    baseline_path = args.baseline or DEFAULT_BASELINE
+    exit_code = 0
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != report['parameters']:
+            print(f"⚠️ Объемы данных отличаются от эталона: {baseline.get('parameters')}")
+        
+        regressions = compare(results, baseline, args.threshold)
+        report['baseline'] = {'path': baseline_path, 'commit': baseline.get('environment', {}).get('commit')}
+        report['regressions'] = regressions
+        for item in regressions:
+            print(f"❌ {item['name']}: {item['baseline_us']} -> {item['current_us']} мкс (x{item['ratio']})")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"✅ Замедлений относительно {baseline_path} нет")
+    
+    if args.output:
+        save_json(report, args.output)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        save_json(report, baseline_path)
+    
+    sys.exit(exit_code)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
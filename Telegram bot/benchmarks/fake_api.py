@@ -0,0 +1,318 @@
+"""
+Локальный стенд Bot API для нагрузочных тестов
+
+    python -m benchmarks.fake_api --port 8081 --latency 0.05 --error-rate 0.01 --flood-rate 0.01
+
+Бот подключается к нему через BOT_API_URL=http://127.0.0.1:8081
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Fake Bot', 'username': 'fake_bot'}
+
+# Ошибки и 429 не подмешиваются в запросы, без которых бот не запустится
+STARTUP_METHODS = frozenset({'getMe', 'getUpdates', 'deleteWebhook', 'setWebhook'})
+
+class FakeBotAPI:
+    """
+    HTTP сервер, отвечающий как Bot API на методы, которые использует бот.
+    Задержка, доля ошибок 500 и доля ответов 429 настраиваются.
+    Обновления для getUpdates добавляются через push_update()
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, flood_rate: float = 0.0,
+                 retry_after: int = 1, member_ratio: float = 0.5, max_poll_wait: float = 1.0,
+                 admin_ids: Tuple[int, ...] = (1,), seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.member_ratio = member_ratio
+        self.max_poll_wait = max_poll_wait
+        self.admin_ids = admin_ids
+        self._random = random.Random(seed)
+        
+        self._updates: List[dict] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._condition = threading.Condition()
+        self._stats_lock = threading.Lock()
+        
+        # Реакции бота на сообщения: (chat_id, message_id) -> время первого deleteMessage/ответа
+        self.reactions: Dict[Tuple[int, int], float] = {}
+        self.calls: Dict[str, int] = {}
+        self.injected_errors = 0
+        self.injected_floods = 0
+        
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeBotAPI':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Стенд Bot API запущен: {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    # Обновления
+
+    def push_update(self, update: dict) -> int:
+        """Добавляет обновление в очередь getUpdates и возвращает его update_id"""
+        with self._condition:
+            update = dict(update, update_id=self._next_update_id)
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._condition.notify_all()
+        return update['update_id']
+
+    def push_message(self, chat_id: int, user_id: int, text: str,
+                     chat_title: str = 'Load test') -> int:
+        """Добавляет сообщение пользователя в группе и возвращает его message_id"""
+        with self._condition:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        self.push_update({'message': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'supergroup', 'title': chat_title},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}',
+                     'username': f'user{user_id}'},
+            'text': text
+        }})
+        return message_id
+
+    def pending_updates(self) -> int:
+        with self._condition:
+            return len(self._updates)
+
+    def wait_for(self, method_name: str, count: int = 1, timeout: float = 30) -> bool:
+        """Ждет, пока бот вызовет метод count раз"""
+        deadline = time.monotonic() + timeout
+        while self.calls.get(method_name, 0) < count:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'calls': dict(sorted(self.calls.items())),
+            'injected_errors': self.injected_errors,
+            'injected_floods': self.injected_floods,
+            'pending_updates': self.pending_updates(),
+            'reactions': len(self.reactions)
+        }
+    
+    # Обработка запросов
+
+    def is_member(self, user_id: int) -> bool:
+        # Детерминированно по user_id, чтобы повторные проверки давали тот же ответ
+        return zlib.crc32(str(user_id).encode()) % 1000 < self.member_ratio * 1000
+
+    def _react(self, chat_id, message_id):
+        if chat_id is None or message_id is None:
+            return
+        key = (int(chat_id), int(message_id))
+        with self._stats_lock:
+            self.reactions.setdefault(key, time.monotonic())
+
+    def _get_updates(self, params: dict) -> list:
+        offset = int(params.get('offset', 0) or 0)
+        limit = int(params.get('limit', 100) or 100)
+        wait = min(float(params.get('timeout', 0) or 0), self.max_poll_wait)
+        deadline = time.monotonic() + wait
+        
+        with self._condition:
+            if offset < 0:
+                # Как в Bot API: последние -offset обновлений, более ранние подтверждаются
+                self._updates = self._updates[offset:]
+            elif offset > 0:
+                self._updates = [u for u in self._updates if u['update_id'] >= offset]
+            
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+            return self._updates[:limit]
+
+    def _send_message(self, params: dict) -> dict:
+        with self._condition:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        chat_id = int(params.get('chat_id', 0))
+        self._react(chat_id, params.get('reply_to_message_id'))
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'supergroup' if chat_id < 0 else 'private'},
+            'from': BOT_USER,
+            'text': params.get('text', '')
+        }
+
+    def _get_chat(self, params: dict) -> dict:
+        chat_id = params.get('chat_id', '')
+        if str(chat_id).startswith('@'):
+            username = str(chat_id)[1:]
+            return {
+                'id': -1000000000000 - zlib.crc32(username.lower().encode()),
+                'type': 'channel', 'title': username, 'username': username
+            }
+        return {'id': int(chat_id), 'type': 'supergroup', 'title': f'Group {chat_id}'}
+
+    def _get_chat_member(self, params: dict) -> dict:
+        user_id = int(params.get('user_id', 0))
+        if user_id == BOT_USER['id']:
+            status = 'administrator'
+        elif user_id in self.admin_ids:
+            status = 'creator'
+        else:
+            status = 'member' if self.is_member(user_id) else 'left'
+        return {
+            'user': {'id': user_id, 'is_bot': user_id == BOT_USER['id'], 'first_name': f'User {user_id}'},
+            'status': status
+        }
+
+    def _get_chat_administrators(self, params: dict) -> list:
+        admins = [{'user': BOT_USER, 'status': 'administrator', 'can_delete_messages': True,
+                   'can_restrict_members': True}]
+        admins.extend(
+            {'user': {'id': user_id, 'is_bot': False, 'first_name': f'Admin {user_id}'}, 'status': 'creator'}
+            for user_id in self.admin_ids
+        )
+        return admins
+
+    def _delete_message(self, params: dict) -> bool:
+        self._react(params.get('chat_id'), params.get('message_id'))
+        return True
+
+    def _delete_messages(self, params: dict) -> bool:
+        for message_id in json.loads(params.get('message_ids', '[]')):
+            self._react(params.get('chat_id'), message_id)
+        return True
+
+    def dispatch(self, method_name: str, params: dict) -> Tuple[int, dict]:
+        """Возвращает HTTP код и тело ответа в формате Bot API"""
+        with self._stats_lock:
+            self.calls[method_name] = self.calls.get(method_name, 0) + 1
+        
+        if method_name not in STARTUP_METHODS:
+            if self.latency or self.jitter:
+                time.sleep(self.latency + random.uniform(0, self.jitter))
+            
+            with self._stats_lock:
+                roll = self._random.random()
+            if roll < self.flood_rate:
+                with self._stats_lock:
+                    self.injected_floods += 1
+                return 429, {
+                    'ok': False, 'error_code': 429,
+                    'description': f'Too Many Requests: retry after {self.retry_after}',
+                    'parameters': {'retry_after': self.retry_after}
+                }
+            if roll < self.flood_rate + self.error_rate:
+                with self._stats_lock:
+                    self.injected_errors += 1
+                return 500, {'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}
+        
+        handlers = {
+            'getMe': lambda params: BOT_USER,
+            'getUpdates': self._get_updates,
+            'getChat': self._get_chat,
+            'getChatMember': self._get_chat_member,
+            'getChatAdministrators': self._get_chat_administrators,
+            'sendMessage': self._send_message,
+            'deleteMessage': self._delete_message,
+            'deleteMessages': self._delete_messages
+        }
+        handler = handlers.get(method_name)
+        # restrictChatMember, deleteWebhook и прочие изменяющие методы просто подтверждаются
+        result = handler(params) if handler else True
+        return 200, {'ok': True, 'result': result}
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Заголовки и тело уходят отдельными записями: без TCP_NODELAY Nagle и отложенный ACK
+            # добавляют к каждому ответу ~40 мс, и тест меряет стенд, а не бота
+            disable_nagle_algorithm = True
+
+            def _handle(self):
+                parts = urlsplit(self.path)
+                params = dict(parse_qsl(parts.query))
+                
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    body = self.rfile.read(length)
+                    content_type = self.headers.get('Content-Type', '')
+                    if content_type.startswith('application/json'):
+                        params.update(json.loads(body))
+                    elif content_type.startswith('application/x-www-form-urlencoded'):
+                        params.update(parse_qsl(body.decode()))
+                
+                method_name = parts.path.rsplit('/', 1)[-1]
+                status, payload = api.dispatch(method_name, params)
+                
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный стенд Bot API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="Задержка ответа, секунд")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Случайная добавка к задержке, секунд")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after в ответах 429")
+    parser.add_argument('--member-ratio', type=float, default=0.5, help="Доля пользователей, подписанных на каналы")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    api = FakeBotAPI(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                     error_rate=args.error_rate, flood_rate=args.flood_rate,
+                     retry_after=args.retry_after, member_ratio=args.member_ratio).start()
+    try:
+        while True:
+            time.sleep(10)
+            logger.info(f"Статистика стенда: {api.stats()}")
+    except KeyboardInterrupt:
+        api.stop()
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
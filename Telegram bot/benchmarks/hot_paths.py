@@ -0,0 +1,201 @@
+"""
+Бенчмарки кода, который выполняется на каждое сообщение
+
+    python -m benchmarks.hot_paths [--output results.json] [--repeat 7] [--filter text]
+"""
+import argparse
+import itertools
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import prepare_environment, offline_api, bench, write_results
+
+DB_PATH = prepare_environment('hot-paths')
+
+from telebot import TeleBot
+from telebot.types import Message
+from database import db
+from config import BOT_TOKEN
+from services.language_service import language_service
+from services.subscription_checker import SubscriptionChecker
+from services.vip_service import VIPService
+from services.vip_index import vip_index
+from services.group_policy import group_policies
+from services.scheduler import scheduler
+from utils.time_parser import parse_time_string, parse_datetime_range
+
+# Объем данных, сопоставимый с рабочей БД крупного развертывания
+SEED_GROUPS = 500
+SEED_CHANNELS_PER_GROUP = 3
+SEED_VIP_USERS = 5000
+SEED_MUTED_USERS = 20000
+
+FIRST_USER_ID = 100000
+FIRST_GROUP_ID = -1001000000000
+
+def _group_id(index: int) -> int:
+    return FIRST_GROUP_ID - index
+
+def seed_database():
+    """Заполняет временную БД группами, каналами, VIP и мутами"""
+    now = datetime.now()
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
+            VALUES (?, ?, ?, ?, 30)
+        ''', [(_group_id(i), f'Группа {i}', f'group_{i}', now) for i in range(SEED_GROUPS)])
+        
+        cursor.executemany('''
+            INSERT INTO channels (channel_id, channel_username, group_id, added_date, check_until, is_active)
+            VALUES (?, ?, ?, ?, ?, 1)
+        ''', [
+            (str(-1002000000000 - i * 10 - j), f'@channel_{i}_{j}', _group_id(i), now, now + timedelta(days=30))
+            for i in range(SEED_GROUPS) for j in range(SEED_CHANNELS_PER_GROUP)
+        ])
+        
+        cursor.executemany('''
+            INSERT INTO vip_users (user_id, username, vip_type, scope, group_id, start_date, end_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (FIRST_USER_ID + i, f'user_{i}', 'VIP_PLUS' if i % 5 == 0 else 'VIP',
+             'global' if i % 2 == 0 else 'local', None if i % 2 == 0 else _group_id(i % SEED_GROUPS),
+             now, now + timedelta(days=30) if i % 3 else None)
+            for i in range(SEED_VIP_USERS)
+        ])
+        
+        cursor.executemany('''
+            INSERT INTO muted_users (user_id, username, group_id, mute_time, mute_end, violations)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (FIRST_USER_ID + SEED_VIP_USERS + i, f'muted_{i}', _group_id(i % SEED_GROUPS),
+             now, now - timedelta(hours=1), 1 + i % 3)
+            for i in range(SEED_MUTED_USERS)
+        ])
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO chat_languages (chat_id, language) VALUES (?, ?)
+        ''', [(_group_id(i), 'en' if i % 4 == 0 else 'ru') for i in range(SEED_GROUPS)])
+    
+    vip_index.reload()
+
+def make_group_message(message_id: int, user_id: int, group_id: int, text: str) -> Message:
+    return Message.de_json({
+        'message_id': message_id,
+        'date': int(time.time()),
+        'chat': {'id': group_id, 'type': 'supergroup', 'title': 'Bench'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'User', 'username': f'u{user_id}'},
+        'text': text
+    })
+
+def find_handler(bot: TeleBot, name: str):
+    for handler in bot.message_handlers:
+        if handler['function'].__name__ == name:
+            return handler['function']
+    raise LookupError(f"Обработчик {name} не зарегистрирован")
+
+def language_benchmarks() -> list:
+    group_id = _group_id(1)
+    en_group_id = _group_id(0)
+    return [
+        ('language.get_text', lambda: language_service.get_text('vip_button', group_id)),
+        ('language.get_text_kwargs', lambda: language_service.get_text(
+            'subscription_warning', en_group_id, username='user', channels='@a, @b, @c')),
+        ('language.get_text_missing_key', lambda: language_service.get_text('no_such_key', group_id))
+    ]
+
+def keyboard_benchmarks(bot: TeleBot) -> list:
+    checker = SubscriptionChecker(bot)
+    group_id = _group_id(2)
+    channels = [f'@channel_2_{j}' for j in range(SEED_CHANNELS_PER_GROUP)]
+    return [
+        ('subscription.create_keyboard', lambda: checker.create_subscription_keyboard(channels, group_id)),
+        ('subscription.create_keyboard_lang', lambda: checker.create_subscription_keyboard(channels, group_id, 'ru'))
+    ]
+
+def time_parser_benchmarks() -> list:
+    durations = itertools.cycle(['30s', '15m', '6h', '1d', '12H', 'bad'])
+    ranges = itertools.cycle([
+        '@channel 01.02.2026 10:00 до 05.02.2026 18:30',
+        '@channel 05.02.2026 10:00 до 01.02.2026 10:00',
+        '@channel завтра'
+    ])
+    return [
+        ('time_parser.parse_time_string', lambda: parse_time_string(next(durations))),
+        ('time_parser.parse_datetime_range', lambda: parse_datetime_range(next(ranges)))
+    ]
+
+def vip_benchmarks(bot: TeleBot) -> list:
+    vip_service = VIPService(bot)
+    global_user = FIRST_USER_ID
+    local_user = FIRST_USER_ID + 1
+    regular_user = FIRST_USER_ID + SEED_VIP_USERS + SEED_MUTED_USERS + 1
+    group_id = _group_id(1)
+    return [
+        ('vip.get_vip_features_global', lambda: vip_service.get_vip_features(global_user, group_id)),
+        ('vip.get_vip_features_local', lambda: vip_service.get_vip_features(local_user, group_id)),
+        ('vip.get_vip_features_none', lambda: vip_service.get_vip_features(regular_user, group_id))
+    ]
+
+def blacklist_benchmarks(bot: TeleBot) -> list:
+    handle_group_message = find_handler(bot, 'handle_group_message')
+    # Поток планировщика в бенчмарке не запущен: каждый мут только добавлял бы срок в его кучу
+    scheduler.notify = lambda deadline: None
+    
+    # Нарушители из засеянной таблицы muted_users: путь с повторным мутом
+    muted = itertools.cycle(range(SEED_MUTED_USERS))
+    # Новые пользователи: первое предупреждение с записью нарушения
+    fresh = itertools.count(FIRST_USER_ID + SEED_VIP_USERS + SEED_MUTED_USERS + 100)
+    message_ids = itertools.count(1)
+
+    def repeat_offender():
+        i = next(muted)
+        handle_group_message(make_group_message(
+            next(message_ids), FIRST_USER_ID + SEED_VIP_USERS + i, _group_id(i % SEED_GROUPS), '/ban @user'))
+
+    def first_offence():
+        handle_group_message(make_group_message(
+            next(message_ids), next(fresh), _group_id(3), '/kick'))
+    
+    return [
+        ('group_message.blacklist_repeat', repeat_offender),
+        ('group_message.blacklist_first', first_offence)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки горячих путей бота")
+    parser.add_argument('--output', help="Файл для результатов в JSON")
+    parser.add_argument('--repeat', type=int, default=7, help="Количество повторов каждого замера")
+    parser.add_argument('--filter', default='', help="Запускать только бенчмарки, содержащие строку")
+    args = parser.parse_args()
+    
+    seed_database()
+    
+    from handlers import mute_management, group_events
+    bot = TeleBot(BOT_TOKEN, threaded=False)
+    mute_management.register_handlers(bot)
+    group_events.register_handlers(bot)
+    
+    suites = [
+        ('language', language_benchmarks()),
+        ('keyboard', keyboard_benchmarks(bot)),
+        ('time_parser', time_parser_benchmarks()),
+        ('vip', vip_benchmarks(bot)),
+        ('blacklist', blacklist_benchmarks(bot))
+    ]
+    
+    results = []
+    with offline_api():
+        # Снимки настроек групп строятся один раз, как в работающем боте
+        for i in range(SEED_GROUPS):
+            group_policies.get(_group_id(i))
+        
+        for group, benchmarks in suites:
+            for name, func in benchmarks:
+                if args.filter in name:
+                    results.append(bench(name, func, group=group, repeat=args.repeat))
+    
+    write_results('hot_paths', results, args.output)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Нагрузочный тест: спам в нескольких группах через настоящую сборку main.py и стенд Bot API
+
+    python -m benchmarks.load_test --groups 50 --messages 5000 --latency 0.02 --output load.json
+
+Параметры бота переопределяются через --set, например --set OUTBOUND_GLOBAL_RATE=1000
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.common import (
+    prepare_environment, import_bot, start_bot, latency_summary, environment_info, save_json
+)
+from benchmarks.fake_api import FakeBotAPI
+
+FIRST_GROUP_ID = -1003000000000
+FIRST_USER_ID = 500000
+# Метка обработчика сообщений групп в метриках (services.metrics.handler_name)
+GROUP_MESSAGE_HANDLER = 'handlers.group_events.register_handlers.handle_group_message'
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработки сообщений в группах")
+    parser.add_argument('--groups', type=int, default=50, help="Количество групп")
+    parser.add_argument('--channels', type=int, default=1, help="Каналов на проверке в каждой группе")
+    parser.add_argument('--users', type=int, default=1000, help="Количество разных отправителей")
+    parser.add_argument('--messages', type=int, default=2000, help="Всего сообщений")
+    parser.add_argument('--rate', type=float, default=0, help="Сообщений в секунду (0 - все сразу)")
+    parser.add_argument('--command-ratio', type=float, default=0.1, help="Доля команд из черного списка")
+    parser.add_argument('--member-ratio', type=float, default=0.0, help="Доля подписанных пользователей")
+    parser.add_argument('--latency', type=float, default=0.02, help="Задержка стенда Bot API, секунд")
+    parser.add_argument('--jitter', type=float, default=0.01, help="Случайная добавка к задержке, секунд")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after в ответах 429")
+    parser.add_argument('--timeout', type=float, default=300, help="Сколько ждать обработки, секунд")
+    parser.add_argument('--seed', type=int, default=1, help="Зерно генератора нагрузки")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="Переменная окружения для config.py (можно несколько раз)")
+    parser.add_argument('--output', help="Файл для результатов в JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     flood_rate=args.flood_rate, retry_after=args.retry_after,
+                     member_ratio=args.member_ratio, seed=args.seed).start()
+    
+    prepare_environment('load-test')
+    # Та же сборка, что и при обычном запуске: транспорт, шлюз, повторы, диспетчер, метрики
+    bot_main = import_bot(api.url, args.set)
+    from database import db
+    from services.metrics import handler_updates
+    from services.api_retry import api_retry
+    from services.outbound import outbound
+    from services.http_transport import http_transport
+    from services.dispatcher import dispatcher
+    from services.update_recorder import update_recorder
+    
+    groups = [FIRST_GROUP_ID - i for i in range(args.groups)]
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
+            VALUES (?, ?, NULL, CURRENT_TIMESTAMP, 30)
+        ''', [(group_id, f'Load {group_id}') for group_id in groups])
+        cursor.executemany('''
+            INSERT INTO channels (channel_id, channel_username, group_id, added_date, is_active)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP, 1)
+        ''', [
+            (str(group_id * 10 - j), f'@load_channel_{j}', group_id)
+            for group_id in groups for j in range(args.channels)
+        ])
+    
+    start_bot(bot_main, api)
+    
+    def handled() -> int:
+        return int(handler_updates.collect().get((GROUP_MESSAGE_HANDLER,), 0))
+    
+    rng = random.Random(args.seed)
+    users = [FIRST_USER_ID + i for i in range(args.users)]
+    pushed = {}
+    handled_before = handled()
+    
+    started = time.monotonic()
+    for i in range(args.messages):
+        if args.rate:
+            delay = started + i / args.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        
+        group_id = rng.choice(groups)
+        user_id = rng.choice(users)
+        text = '/ban @someone' if rng.random() < args.command_ratio else f'spam message {i}'
+        message_id = api.push_message(group_id, user_id, text)
+        # Реакции (удаление) ждем только от сообщений неподписанных пользователей
+        if text.startswith('/') or not api.is_member(user_id):
+            pushed[(group_id, message_id)] = time.monotonic()
+    generated = time.monotonic() - started
+    
+    deadline = started + args.timeout
+    while handled() - handled_before < args.messages and time.monotonic() < deadline:
+        time.sleep(0.05)
+    elapsed = time.monotonic() - started
+    processed = handled() - handled_before
+    
+    latencies = sorted(
+        (api.reactions[key] - pushed_at) * 1000
+        for key, pushed_at in pushed.items() if key in api.reactions
+    )
+    
+    report = {
+        'suite': 'load_test',
+        'environment': environment_info(),
+        'parameters': vars(args),
+        'result': {
+            'messages': args.messages,
+            'processed': processed,
+            'generate_seconds': round(generated, 3),
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_per_second': round(processed / elapsed, 1) if elapsed else 0.0,
+            'expected_reactions': len(pushed),
+            'reactions': len(latencies),
+            'latency_ms': latency_summary(latencies)
+        },
+        'fake_api': api.stats(),
+        'bot': {
+            'api_retry': api_retry.stats(),
+            'outbound': outbound.stats(),
+            'http': http_transport.stats(),
+            'lanes': dispatcher.stats()
+        }
+    }
+    
+    result = report['result']
+    print(f"Обработано: {processed}/{args.messages} за {result['elapsed_seconds']} с "
+          f"({result['throughput_per_second']} сообщ/с)")
+    print(f"Реакции: {result['reactions']}/{result['expected_reactions']}, задержка мс: "
+          + ', '.join(f"{name}={value}" for name, value in result['latency_ms'].items()))
+    print(f"Стенд: {report['fake_api']['calls']}, 500: {api.injected_errors}, 429: {api.injected_floods}")
+    
+    if args.output:
+        save_json(report, args.output)
+    
+    api.stop()
+    # os._exit не вызывает atexit: запись обновлений (если включена через --set) закрывается явно
+    update_recorder.close()
+    # Потоки бота (polling, линии, планировщик) не завершаются сами
+    os._exit(0 if processed == args.messages else 1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
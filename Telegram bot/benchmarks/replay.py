@@ -0,0 +1,230 @@
+"""
+Воспроизведение записанных обновлений (UPDATE_RECORD_PATH) через настоящую сборку main.py и стенд Bot API
+
+    python -m benchmarks.replay recordings/updates*.jsonl.gz --speed 10 --output replay.json
+
+--speed 1 сохраняет исходные интервалы между обновлениями, 10 - в десять раз быстрее,
+0 - все обновления сразу. Параметры бота переопределяются через --set
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import (
+    prepare_environment, import_bot, start_bot, latency_summary, environment_info, save_json
+)
+from benchmarks.fake_api import FakeBotAPI, BOT_USER
+
+GROUP_TYPES = ('group', 'supergroup')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных обновлений")
+    parser.add_argument('files', nargs='+', help="Файлы записи (*.jsonl.gz), в том числе ротированные")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Ускорение относительно записи (1 - исходная скорость, 0 - без пауз)")
+    parser.add_argument('--limit', type=int, default=0, help="Воспроизвести только первые N обновлений")
+    parser.add_argument('--channels', type=int, default=1, help="Каналов на проверке в каждой группе")
+    parser.add_argument('--member-ratio', type=float, default=0.8, help="Доля подписанных пользователей")
+    parser.add_argument('--latency', type=float, default=0.02, help="Задержка стенда Bot API, секунд")
+    parser.add_argument('--jitter', type=float, default=0.01, help="Случайная добавка к задержке, секунд")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after в ответах 429")
+    parser.add_argument('--timeout', type=float, default=300,
+                        help="Сколько ждать обработки после отправки последнего обновления, секунд")
+    parser.add_argument('--seed', type=int, default=1, help="Зерно генератора ошибок стенда")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="Переменная окружения для config.py (можно несколько раз)")
+    parser.add_argument('--output', help="Файл для результатов в JSON")
+    return parser.parse_args()
+
+def load_records(paths: list, limit: int = 0) -> list:
+    """Читает записи из всех файлов в порядке времени получения"""
+    from services.update_recorder import read_recording
+    
+    records = [record for path in sorted(paths) for record in read_recording(path)]
+    records.sort(key=lambda record: record['ts'])
+    return records[:limit] if limit else records
+
+def restore(value, owner_id: int, date_shift: int):
+    """
+    Подставляет стенд вместо постоянных ID записи: SELF_ID - бот стенда,
+    OWNER_PLACEHOLDER_ID - OWNER_ID. Даты сдвигаются к текущему времени
+    """
+    from services.update_recorder import SELF_ID, OWNER_PLACEHOLDER_ID
+    
+    if isinstance(value, list):
+        return [restore(item, owner_id, date_shift) for item in value]
+    if not isinstance(value, dict):
+        return value
+    
+    if value.get('is_bot') and value.get('id') == SELF_ID:
+        return dict(BOT_USER)
+    
+    result = {}
+    for field, item in value.items():
+        if field == 'date' and isinstance(item, int):
+            result[field] = item + date_shift
+        else:
+            result[field] = restore(item, owner_id, date_shift)
+    if 'id' in value and value['id'] == OWNER_PLACEHOLDER_ID and ('is_bot' in value or value.get('type') == 'private'):
+        result['id'] = owner_id
+    return result
+
+def message_key(update: dict):
+    """(chat_id, message_id) сообщения в обновлении, на которое бот может отреагировать"""
+    message = update.get('message') or update.get('edited_message')
+    if not message:
+        return None
+    return message['chat']['id'], message['message_id']
+
+def group_ids(records: list) -> list:
+    """Группы, встречающиеся в записи"""
+    groups = set()
+    for record in records:
+        for item in record['update'].values():
+            chat = item.get('chat') if isinstance(item, dict) else None
+            if not chat and isinstance(item, dict) and isinstance(item.get('message'), dict):
+                chat = item['message'].get('chat')
+            if chat and chat.get('type') in GROUP_TYPES:
+                groups.add(chat['id'])
+    return sorted(groups)
+
+def main():
+    args = parse_args()
+    
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     flood_rate=args.flood_rate, retry_after=args.retry_after,
+                     member_ratio=args.member_ratio, seed=args.seed).start()
+    
+    prepare_environment('replay')
+    # Та же сборка, что и при обычном запуске: транспорт, шлюз, повторы, диспетчер, метрики
+    bot_main = import_bot(api.url, args.set)
+    from config import OWNER_ID
+    from database import db
+    from services.metrics import handler_errors, handler_seconds
+    from services.api_retry import api_retry
+    from services.outbound import outbound
+    from services.http_transport import http_transport
+    from services.dispatcher import dispatcher
+    from services.update_recorder import update_recorder
+    
+    records = load_records(args.files, args.limit)
+    if not records:
+        raise SystemExit("В записи нет обновлений")
+    
+    # Группы из записи регистрируются заранее, как у работающего бота
+    groups = group_ids(records)
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
+            VALUES (?, ?, NULL, CURRENT_TIMESTAMP, 30)
+        ''', [(group_id, f'Replay {group_id}') for group_id in groups])
+        cursor.executemany('''
+            INSERT INTO channels (channel_id, channel_username, group_id, added_date, is_active)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP, 1)
+        ''', [
+            (str(group_id * 10 - j), f'@replay_channel_{j}', group_id)
+            for group_id in groups for j in range(args.channels)
+        ])
+    
+    start_bot(bot_main, api)
+
+    def processed_total() -> int:
+        return sum(lane.processed for lane in dispatcher.lanes)
+    
+    first_ts = records[0]['ts']
+    recorded_seconds = records[-1]['ts'] - first_ts
+    date_shift = int(time.time() - first_ts)
+    # Обработчики вызывались и при запуске бота, в отчет идет только воспроизведение
+    seconds_before = {labels: (value[1], value[2]) for labels, value in handler_seconds.collect().items()}
+    errors_before = handler_errors.collect()
+    processed_before = processed_total()
+    pushed = {}
+    
+    started = time.monotonic()
+    for record in records:
+        if args.speed:
+            delay = started + (record['ts'] - first_ts) / args.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        
+        update = restore(record['update'], OWNER_ID, date_shift)
+        update.pop('update_id', None)
+        api.push_update(update)
+        key = message_key(update)
+        if key:
+            pushed.setdefault(key, time.monotonic())
+    sent = time.monotonic() - started
+    
+    deadline = time.monotonic() + args.timeout
+    while processed_total() - processed_before < len(records) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    elapsed = time.monotonic() - started
+    processed = processed_total() - processed_before
+    
+    latencies = sorted(
+        (api.reactions[key] - pushed_at) * 1000
+        for key, pushed_at in pushed.items() if key in api.reactions
+    )
+    
+    errors = handler_errors.collect()
+    handlers = {}
+    for labels, (_, total, count) in sorted(handler_seconds.collect().items()):
+        total_before, count_before = seconds_before.get(labels, (0.0, 0))
+        total -= total_before
+        count -= count_before
+        if count > 0:
+            handlers[labels[0]] = {
+                'updates': count,
+                'errors': int(errors.get(labels, 0) - errors_before.get(labels, 0)),
+                'mean_ms': round(total / count * 1000, 3),
+                'total_seconds': round(total, 3)
+            }
+    
+    report = {
+        'suite': 'replay',
+        'environment': environment_info(),
+        'parameters': vars(args),
+        'result': {
+            'updates': len(records),
+            'groups': len(groups),
+            'processed': processed,
+            'recorded_seconds': round(recorded_seconds, 3),
+            'send_seconds': round(sent, 3),
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_per_second': round(processed / elapsed, 1) if elapsed else 0.0,
+            'reactions': len(latencies),
+            'latency_ms': latency_summary(latencies)
+        },
+        'handlers': handlers,
+        'fake_api': api.stats(),
+        'bot': {
+            'api_retry': api_retry.stats(),
+            'outbound': outbound.stats(),
+            'http': http_transport.stats(),
+            'lanes': dispatcher.stats()
+        }
+    }
+    
+    result = report['result']
+    print(f"Обработано: {processed}/{len(records)} за {result['elapsed_seconds']} с "
+          f"(запись: {result['recorded_seconds']} с, {result['throughput_per_second']} обновл/с)")
+    print(f"Реакции: {result['reactions']}, задержка мс: "
+          + ', '.join(f"{name}={value}" for name, value in result['latency_ms'].items()))
+    for name, item in handlers.items():
+        print(f"  {name}: {item['updates']} обновл., {item['mean_ms']} мс в среднем, ошибок {item['errors']}")
+    print(f"Стенд: {report['fake_api']['calls']}, 500: {api.injected_errors}, 429: {api.injected_floods}")
+    
+    if args.output:
+        save_json(report, args.output)
+    
+    api.stop()
+    # os._exit не вызывает atexit: запись обновлений (если включена через --set) закрывается явно
+    update_recorder.close()
+    # Потоки бота (polling, линии, планировщик) не завершаются сами
+    os._exit(0 if processed == len(records) else 1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
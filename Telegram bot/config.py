@@ -18,6 +18,9 @@ OWNER_ID: Final = int(OWNER_ID_STR)
 
 # Настройки базы данных
 DATABASE_NAME: Final = os.getenv('DATABASE_NAME', 'bot_database.db')
+DB_CACHE_SIZE_KB: Final = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))  # кэш страниц на соединение
+DB_MMAP_SIZE: Final = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))  # байт
+DB_SLOW_QUERY_MS: Final = float(os.getenv('DB_SLOW_QUERY_MS', '100'))  # порог журнала медленных запросов
 
 # Максимальное количество каналов на проверку в одной группе
 MAX_CHANNELS_PER_GROUP: Final = 3
@@ -26,6 +29,84 @@ MAX_CHANNELS_PER_GROUP: Final = 3
 MIN_AUTO_DELETE_TIME: Final = 15  # секунд
 MAX_AUTO_DELETE_TIME: Final = 600  # секунд (10 минут)
 
+# Кэш результатов проверки подписки
+MEMBERSHIP_CACHE_POSITIVE_TTL: Final = int(os.getenv('MEMBERSHIP_CACHE_POSITIVE_TTL', '300'))  # секунд
+MEMBERSHIP_CACHE_NEGATIVE_TTL: Final = int(os.getenv('MEMBERSHIP_CACHE_NEGATIVE_TTL', '30'))  # секунд
+MEMBERSHIP_CACHE_MAX_SIZE: Final = int(os.getenv('MEMBERSHIP_CACHE_MAX_SIZE', '50000'))
+
+# Время жизни кэша списка администраторов группы
+ADMIN_CACHE_TTL: Final = int(os.getenv('ADMIN_CACHE_TTL', '600'))  # секунд
+
+# Размер общего пула потоков для параллельной проверки подписки на каналы
+SUBSCRIPTION_CHECK_WORKERS: Final = int(os.getenv('SUBSCRIPTION_CHECK_WORKERS', '8'))
+
+# Адрес сервера Bot API: пусто - api.telegram.org, иначе локальный Bot API сервер
+# или тестовый стенд benchmarks/fake_api.py, например http://127.0.0.1:8081
+BOT_API_URL: Final = os.getenv('BOT_API_URL', '')
+
+# Порт Flask сервера (keep-alive, /metrics и webhook)
+FLASK_PORT: Final = int(os.getenv('FLASK_PORT', '8080'))
+
+# Способ получения обновлений: polling или webhook
+BOT_MODE: Final = os.getenv('BOT_MODE', 'polling').lower()
+if BOT_MODE not in ('polling', 'webhook'):
+    raise ValueError("BOT_MODE должен быть polling или webhook!")
+
+# Настройки webhook
+WEBHOOK_URL: Final = os.getenv('WEBHOOK_URL', '')  # публичный адрес Flask сервера, например https://example.com
+if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+    raise ValueError("WEBHOOK_URL не установлен в .env файле!")
+WEBHOOK_PATH: Final = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET: Final = os.getenv('WEBHOOK_SECRET', '')  # сверяется с X-Telegram-Bot-Api-Secret-Token
+# Без секрета любой, кто знает адрес, может прислать поддельное обновление от имени владельца
+if BOT_MODE == 'webhook' and not WEBHOOK_SECRET:
+    raise ValueError("WEBHOOK_SECRET не установлен в .env файле!")
+WEBHOOK_QUEUE_SIZE: Final = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))  # всего ожидающих в линиях, дальше ответ 503
+
+# Диспетчер обновлений: число линий (обновления одного чата всегда идут в одну линию)
+DISPATCHER_LANES: Final = int(os.getenv('DISPATCHER_LANES', '8'))
+DISPATCHER_LANE_SIZE: Final = int(os.getenv('DISPATCHER_LANE_SIZE', '1000'))  # обновлений в очереди линии
+
+# Ограничение исходящих запросов к Bot API (лимиты Telegram)
+OUTBOUND_GLOBAL_RATE: Final = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))  # запросов в секунду на бота
+OUTBOUND_GROUP_PER_MINUTE: Final = float(os.getenv('OUTBOUND_GROUP_PER_MINUTE', '20'))  # сообщений в минуту в группу
+OUTBOUND_PRIVATE_RATE: Final = float(os.getenv('OUTBOUND_PRIVATE_RATE', '1'))  # сообщений в секунду в личный чат
+OUTBOUND_LOW_TIMEOUT: Final = float(os.getenv('OUTBOUND_LOW_TIMEOUT', '5'))  # сек ожидания для низкого приоритета
+
+# Повторы запросов к Bot API
+API_RETRY_MAX_ATTEMPTS: Final = int(os.getenv('API_RETRY_MAX_ATTEMPTS', '4'))
+API_RETRY_BASE_DELAY: Final = float(os.getenv('API_RETRY_BASE_DELAY', '0.5'))  # секунд
+API_RETRY_BUDGET: Final = float(os.getenv('API_RETRY_BUDGET', '10'))  # секунд на все попытки
+
+# HTTP соединения с Bot API
+HTTP_POOL_CONNECTIONS: Final = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))  # пулов (хостов)
+HTTP_POOL_SIZE: Final = int(os.getenv('HTTP_POOL_SIZE', '32'))  # keep-alive соединений в пуле
+HTTP_CONNECT_TIMEOUT: Final = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))  # секунд
+HTTP_READ_TIMEOUT: Final = float(os.getenv('HTTP_READ_TIMEOUT', '15'))  # секунд
+
+# Таймауты чтения для отдельных методов (getUpdates использует таймаут long polling)
+HTTP_METHOD_TIMEOUTS = {
+    'getChatMember': 5,
+    'getChat': 5,
+    'getChatAdministrators': 5,
+    'getMe': 5,
+    'deleteMessage': 5,
+    'deleteMessages': 10,
+    'sendPhoto': 60,
+    'sendDocument': 60,
+    'sendVideo': 60
+}
+
+# Журнал медленных обновлений
+SLOW_UPDATE_THRESHOLD_MS: Final = float(os.getenv('SLOW_UPDATE_THRESHOLD_MS', '500'))
+SLOW_LOG_SAMPLE_RATE: Final = float(os.getenv('SLOW_LOG_SAMPLE_RATE', '0.1'))  # доля обновлений с разбивкой времени
+
+# Запись входящих обновлений для воспроизведения (benchmarks/replay.py)
+UPDATE_RECORD_PATH: Final = os.getenv('UPDATE_RECORD_PATH', '')  # например recordings/updates.jsonl.gz, пусто - выключено
+UPDATE_RECORD_MAX_MB: Final = float(os.getenv('UPDATE_RECORD_MAX_MB', '50'))  # размер файла до ротации
+UPDATE_RECORD_BACKUPS: Final = int(os.getenv('UPDATE_RECORD_BACKUPS', '5'))  # сколько старых файлов хранить
+UPDATE_RECORD_SALT: Final = os.getenv('UPDATE_RECORD_SALT', '')  # соль псевдонимов, пусто - новая при каждом запуске
+
 # Режим отладки
 DEBUG: Final = os.getenv('DEBUG', 'False').lower() == 'true'
 
@@ -65,6 +146,8 @@ VIP_FEATURES = {
 }
 
 # Уровни нарушений для мута
+# Эскалация за команды из черного списка. Первое нарушение хранится без срока
+# (до /off_mute или /del_all_mute), счетчик сбрасывается, когда истекает мут
 VIOLATION_LEVELS = {
     1: {"mute_time": 0, "action": "warning"},           # 1 нарушение - предупреждение
     2: {"mute_time": 600, "action": "mute"},            # 2 нарушение - мут 10 минут
@@ -1,12 +1,336 @@
+import re
 import sqlite3
 import threading
+import time
 from datetime import datetime
 from contextlib import contextmanager
-from config import DATABASE_NAME, OWNER_ID
+from functools import lru_cache
+from config import DATABASE_NAME, OWNER_ID, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_SLOW_QUERY_MS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Миграции схемы. Номер последней примененной миграции хранится в PRAGMA user_version.
+# Миграции идемпотентны: базы, созданные до появления версий, проходят их все заново.
+
+def _migration_base_schema(cursor):
+    # Таблица групп
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS groups (
+            group_id INTEGER PRIMARY KEY,
+            group_title TEXT,
+            group_username TEXT,
+            added_date TIMESTAMP,
+            auto_del_time INTEGER DEFAULT 30
+        )
+    ''')
+    
+    # Таблица каналов на проверке
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id TEXT,
+            channel_username TEXT,
+            group_id INTEGER,
+            added_date TIMESTAMP,
+            check_until TIMESTAMP,
+            is_active INTEGER DEFAULT 1,
+            FOREIGN KEY(group_id) REFERENCES groups(group_id)
+        )
+    ''')
+    
+    # Таблица VIP пользователей
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vip_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            username TEXT,
+            vip_type TEXT CHECK(vip_type IN ('VIP', 'VIP_PLUS')),
+            scope TEXT CHECK(scope IN ('local', 'global')),
+            group_id INTEGER,
+            start_date TIMESTAMP,
+            end_date TIMESTAMP,
+            FOREIGN KEY(group_id) REFERENCES groups(group_id)
+        )
+    ''')
+    
+    # Таблица мутированных пользователей
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS muted_users (
+            user_id INTEGER,
+            username TEXT,
+            group_id INTEGER,
+            mute_time TIMESTAMP,
+            mute_end TIMESTAMP,
+            violations INTEGER DEFAULT 1,
+            PRIMARY KEY (user_id, group_id)
+        )
+    ''')
+    
+    # Таблица выбранной группы для owner
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS owner_selected_group (
+            owner_id INTEGER PRIMARY KEY,
+            selected_group_id INTEGER
+        )
+    ''')
+    
+    # Таблица для черного списка команд
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blacklist_commands (
+            command TEXT PRIMARY KEY,
+            description TEXT
+        )
+    ''')
+    
+    # Таблица языков чатов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_languages (
+            chat_id INTEGER PRIMARY KEY,
+            language TEXT DEFAULT 'ru'
+        )
+    ''')
+
+def _migration_channel_id(cursor):
+    # Базы, созданные старой версией схемы, не содержат channels.channel_id
+    cursor.execute('PRAGMA table_info(channels)')
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'channel_id' not in columns:
+        cursor.execute('ALTER TABLE channels ADD COLUMN channel_id TEXT')
+
+def _migration_hot_path_indexes(cursor):
+    # Проверка VIP: user_id + scope/group_id + end_date, vip_type для покрытия
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vip_users_user
+        ON vip_users (user_id, scope, group_id, end_date, vip_type)
+    ''')
+    # Удаление истекших VIP планировщиком
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vip_users_end_date
+        ON vip_users (end_date)
+    ''')
+    # Удаление VIP по username
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vip_users_username
+        ON vip_users (username, vip_type)
+    ''')
+    # Активные каналы группы на каждое сообщение
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_channels_group_active
+        ON channels (group_id, is_active, check_until, channel_username, channel_id)
+    ''')
+    # Истекшие каналы для планировщика
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_channels_check_until
+        ON channels (check_until)
+        WHERE is_active = 1 AND check_until IS NOT NULL
+    ''')
+    # Поиск канала по username (del_one, обновление ID)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_channels_username
+        ON channels (channel_username, group_id)
+    ''')
+    # Истекшие муты для планировщика
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_muted_users_mute_end
+        ON muted_users (mute_end)
+    ''')
+    # Муты группы (/status, /mute_status, /del_all_mute)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_muted_users_group
+        ON muted_users (group_id, mute_end)
+    ''')
+
+def _migration_pending_deletions(cursor):
+    # Отложенное удаление сообщений бота (переживает перезапуск)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pending_deletions (
+            chat_id INTEGER,
+            message_id INTEGER,
+            delete_at REAL,
+            PRIMARY KEY (chat_id, message_id)
+        )
+    ''')
+
+def _migration_vip_scope_index(cursor):
+    # VIP группы и глобальные VIP для /status: обе ветки UNION ALL ищут по scope,
+    # локальная дополнительно по group_id
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vip_users_scope_group
+        ON vip_users (scope, group_id, end_date)
+    ''')
+
+# (версия, описание, функция)
+MIGRATIONS = [
+    (1, 'базовая схема', _migration_base_schema),
+    (2, 'колонка channels.channel_id', _migration_channel_id),
+    (3, 'индексы для горячих запросов', _migration_hot_path_indexes),
+    (4, 'очередь автоудаления сообщений', _migration_pending_deletions),
+    (5, 'индекс VIP по scope и группе', _migration_vip_scope_index),
+]
+
+# Горячие запросы, для которых в режиме отладки логируется EXPLAIN QUERY PLAN
+# имя -> (SQL, пример параметров)
+HOT_QUERIES = {
+    'vip_global': ('''
+        SELECT 1 FROM vip_users 
+        WHERE user_id = ? AND scope = 'global'
+        AND (end_date IS NULL OR end_date > ?)
+    ''', (0, datetime.now())),
+    'vip_local': ('''
+        SELECT 1 FROM vip_users 
+        WHERE user_id = ? AND group_id = ? AND scope = 'local'
+        AND (end_date IS NULL OR end_date > ?)
+    ''', (0, 0, datetime.now())),
+    'vip_features': ('''
+        SELECT vip_type FROM vip_users 
+        WHERE user_id = ? AND (group_id = ? OR scope = 'global')
+        AND (end_date IS NULL OR end_date > ?)
+    ''', (0, 0, datetime.now())),
+    'active_channels': ('''
+        SELECT channel_username, channel_id FROM channels 
+        WHERE group_id = ? AND is_active = 1 
+        AND (check_until IS NULL OR check_until > ?)
+    ''', (0, datetime.now())),
+    'expired_channels': ('''
+        SELECT c.*, g.group_title 
+        FROM channels c
+        JOIN groups g ON c.group_id = g.group_id
+        WHERE c.check_until IS NOT NULL 
+        AND c.check_until <= ? 
+        AND c.is_active = 1
+    ''', (datetime.now(),)),
+    'expired_vip': ('''
+        SELECT id FROM vip_users 
+        WHERE end_date IS NOT NULL AND end_date <= ?
+    ''', (datetime.now(),)),
+    'expired_mutes': ('''
+        SELECT * FROM muted_users 
+        WHERE mute_end <= ?
+    ''', (datetime.now(),)),
+    'group_mutes': ('''
+        SELECT * FROM muted_users WHERE group_id = ? AND mute_end > ?
+    ''', (0, datetime.now())),
+}
+
+# Наблюдатели за запросами: функция(sql, время выполнения в секундах)
+_query_observers = []
+
+# Статистика по нормализованным запросам: у каждого потока свой словарь,
+# суммируются они только при выгрузке
+_statement_shards = []
+_statement_shards_lock = threading.Lock()
+_statement_local = threading.local()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """Приводит запрос к шаблону: литералы заменены на ?, пробелы схлопнуты"""
+    normalized = _STRING_LITERAL.sub('?', sql)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _IN_LIST.sub('IN (?)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+def redact_params(parameters) -> str:
+    """Параметры запроса для журнала: только типы и длины, без значений"""
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: <{type(value).__name__}>' for key, value in parameters.items()) + '}'
+    
+    redacted = []
+    for value in parameters or ():
+        if isinstance(value, (str, bytes)):
+            redacted.append(f'<{type(value).__name__}:{len(value)}>')
+        else:
+            redacted.append(f'<{type(value).__name__}>')
+    return '(' + ', '.join(redacted) + ')'
+
+def _statement_entry(statement: str) -> list:
+    shard = getattr(_statement_local, 'shard', None)
+    if shard is None:
+        shard = _statement_local.shard = {}
+        with _statement_shards_lock:
+            _statement_shards.append(shard)
+    
+    entry = shard.get(statement)
+    if entry is None:
+        # [вызовы, общее время, максимальное время, строки]
+        entry = shard[statement] = [0, 0.0, 0.0, 0]
+    return entry
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Курсор, который учитывает каждый запрос: число вызовов, время и строки
+    по нормализованному запросу, медленные запросы пишет в журнал
+    """
+    _entry = None
+
+    def _record(self, sql: str, parameters, elapsed: float):
+        statement = normalize_sql(sql)
+        entry = self._entry = _statement_entry(statement)
+        entry[0] += 1
+        entry[1] += elapsed
+        if elapsed > entry[2]:
+            entry[2] = elapsed
+        if self.rowcount > 0:
+            entry[3] += self.rowcount
+        
+        if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            # Параметры маскируются только для журнала, чтобы не тратить время на каждом запросе
+            shown = '<executemany>' if parameters is None else redact_params(parameters)
+            logger.warning(f"Медленный запрос {elapsed * 1000:.1f} мс: {statement} {shown}")
+        
+        for observer in _query_observers:
+            observer(sql, elapsed)
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(sql, None, time.perf_counter() - started)
+    
+    # Строки, возвращенные SELECT, учитываются при выборке
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self._entry is not None:
+            self._entry[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size if size is not None else self.arraysize)
+        if self._entry is not None:
+            self._entry[3] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self._entry is not None:
+            self._entry[3] += len(rows)
+        return rows
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, которое выдает только InstrumentedCursor"""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    # Встроенные execute соединения создают обычный курсор, поэтому идем через cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
 class Database:
     _instance = None
     _lock = threading.Lock()
@@ -21,108 +345,131 @@ class Database:
 
     def _initialize(self):
         logger.info(f"Инициализация базы данных: {DATABASE_NAME}")
+        # У каждого потока свое постоянное соединение
+        self._local = threading.local()
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает соединение и один раз настраивает его"""
+        conn = sqlite3.connect(DATABASE_NAME, timeout=10, factory=InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+        return conn
+
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(DATABASE_NAME, timeout=10)
-        conn.row_factory = sqlite3.Row
+        """
+        Соединение потока в транзакции. Фиксирует ее только внешний блок; вложенный блок
+        работает в точке сохранения (SAVEPOINT), и его ошибка откатывает только его изменения.
+        Кэши, зависящие от записанных данных, обновляются после выхода из внешнего блока
+        """
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = self._connect()
+            local.depth = 0
+        
+        local.depth += 1
+        savepoint = None
         try:
+            if local.depth > 1:
+                # Служебные команды идут мимо InstrumentedCursor и не попадают в статистику
+                sqlite3.Connection.execute(conn, f'SAVEPOINT sp_{local.depth}')
+                savepoint = f'sp_{local.depth}'
             yield conn
-            conn.commit()
+            if savepoint:
+                sqlite3.Connection.execute(conn, f'RELEASE {savepoint}')
+            else:
+                conn.commit()
         except Exception as e:
-            conn.rollback()
+            if savepoint:
+                # После некоторых ошибок SQLite сам откатывает всю транзакцию
+                if conn.in_transaction:
+                    sqlite3.Connection.execute(conn, f'ROLLBACK TO {savepoint}')
+                    sqlite3.Connection.execute(conn, f'RELEASE {savepoint}')
+            else:
+                conn.rollback()
             logger.error(f"Ошибка БД: {e}")
             raise e
         finally:
+            local.depth -= 1
+
+    @staticmethod
+    def add_query_observer(observer):
+        """Подписывает функцию observer(sql, elapsed) на все запросы к БД"""
+        _query_observers.append(observer)
+
+    @staticmethod
+    def get_statement_stats(limit: int = 10) -> list:
+        """
+        Самые затратные запросы по суммарному времени:
+        список словарей statement, calls, total_ms, avg_ms, max_ms, rows
+        """
+        totals = {}
+        with _statement_shards_lock:
+            shards = list(_statement_shards)
+        for shard in shards:
+            for statement, (calls, total, maximum, rows) in list(shard.items()):
+                merged = totals.setdefault(statement, [0, 0.0, 0.0, 0])
+                merged[0] += calls
+                merged[1] += total
+                merged[2] = max(merged[2], maximum)
+                merged[3] += rows
+        
+        top = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {
+                'statement': statement,
+                'calls': calls,
+                'total_ms': round(total * 1000, 2),
+                'avg_ms': round(total * 1000 / calls, 3) if calls else 0.0,
+                'max_ms': round(maximum * 1000, 2),
+                'rows': rows
+            }
+            for statement, (calls, total, maximum, rows) in top
+        ]
+
+    def close_connection(self):
+        """Закрывает соединение текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
             conn.close()
+            self._local.conn = None
 
     def _init_db(self):
+        self._migrate()
+        self._seed_data()
+
+    def _migrate(self):
+        """Применяет недостающие миграции схемы по PRAGMA user_version"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Таблица групп
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS groups (
-                    group_id INTEGER PRIMARY KEY,
-                    group_title TEXT,
-                    group_username TEXT,
-                    added_date TIMESTAMP,
-                    auto_del_time INTEGER DEFAULT 30
-                )
-            ''')
-            
-            # Таблица каналов на проверке
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS channels (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    channel_id TEXT,
-                    channel_username TEXT,
-                    group_id INTEGER,
-                    added_date TIMESTAMP,
-                    check_until TIMESTAMP,
-                    is_active INTEGER DEFAULT 1,
-                    FOREIGN KEY(group_id) REFERENCES groups(group_id)
-                )
-            ''')
-            
-            # Таблица VIP пользователей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS vip_users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    username TEXT,
-                    vip_type TEXT CHECK(vip_type IN ('VIP', 'VIP_PLUS')),
-                    scope TEXT CHECK(scope IN ('local', 'global')),
-                    group_id INTEGER,
-                    start_date TIMESTAMP,
-                    end_date TIMESTAMP,
-                    FOREIGN KEY(group_id) REFERENCES groups(group_id)
-                )
-            ''')
-            
-            # Таблица мутированных пользователей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS muted_users (
-                    user_id INTEGER,
-                    username TEXT,
-                    group_id INTEGER,
-                    mute_time TIMESTAMP,
-                    mute_end TIMESTAMP,
-                    violations INTEGER DEFAULT 1,
-                    PRIMARY KEY (user_id, group_id)
-                )
-            ''')
+            current = conn.execute('PRAGMA user_version').fetchone()[0]
+        
+        for version, description, migration in MIGRATIONS:
+            if version <= current:
+                continue
             
-            # Таблица выбранной группы для owner
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS owner_selected_group (
-                    owner_id INTEGER PRIMARY KEY,
-                    selected_group_id INTEGER
-                )
-            ''')
+            logger.info(f"Миграция БД {version}: {description}")
+            with self.get_connection() as conn:
+                migration(conn.cursor())
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+            current = version
+        
+        logger.info(f"Версия схемы БД: {current}")
+
+    def _seed_data(self):
+        """Заполняет служебные данные"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
             
             cursor.execute('''
                 INSERT OR IGNORE INTO owner_selected_group (owner_id, selected_group_id) 
                 VALUES (?, NULL)
             ''', (OWNER_ID,))
             
-            # Таблица для черного списка команд
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS blacklist_commands (
-                    command TEXT PRIMARY KEY,
-                    description TEXT
-                )
-            ''')
-            
-            # Таблица языков чатов
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS chat_languages (
-                    chat_id INTEGER PRIMARY KEY,
-                    language TEXT DEFAULT 'ru'
-                )
-            ''')
-            
             # Добавляем команды в черный список
             blacklist_commands = [
                 ('/add_one', 'Добавить канал'),
@@ -149,4 +496,15 @@ class Database:
                 cursor.execute('INSERT OR IGNORE INTO blacklist_commands (command, description) VALUES (?, ?)',
                              (cmd, desc))
 
+    def explain_hot_queries(self):
+        """Логирует планы выполнения горячих запросов"""
+        with self.get_connection() as conn:
+            for name, (sql, params) in HOT_QUERIES.items():
+                try:
+                    plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+                    details = '; '.join(row[3] for row in plan)
+                    logger.debug(f"План запроса {name}: {details}")
+                except sqlite3.Error as e:
+                    logger.error(f"Не удалось получить план запроса {name}: {e}")
+
 db = Database()
\ No newline at end of file
@@ -2,11 +2,13 @@ from telebot import TeleBot
 from telebot.types import Message
 from database import db
 from utils.decorators import owner_only
-from utils.helpers import get_selected_group
+from utils.helpers import get_selected_group, get_channel_id_by_username
 from utils.time_parser import parse_time_string, parse_datetime_range
 from config import MAX_CHANNELS_PER_GROUP, MIN_AUTO_DELETE_TIME, MAX_AUTO_DELETE_TIME
 from datetime import datetime, timedelta
 from services.language_service import language_service
+from services.group_policy import group_policies
+from services.scheduler import scheduler
 import re
 import logging
 
@@ -58,17 +60,24 @@ def register_handlers(bot: TeleBot):
                     )
                     return
                 
+                # Сразу получаем числовой ID, чтобы не запрашивать его на каждое сообщение
+                channel_id = get_channel_id_by_username(bot, channel)
+                if channel_id is None:
+                    logger.warning(f"Не удалось получить ID канала {channel}, он будет получен при проверке")
+                
                 # Добавляем канал
                 cursor.execute('''
-                    INSERT INTO channels (channel_username, group_id, added_date, is_active)
-                    VALUES (?, ?, ?, 1)
-                ''', (channel, group_id, datetime.now()))
+                    INSERT INTO channels (channel_id, channel_username, group_id, added_date, is_active)
+                    VALUES (?, ?, ?, ?, 1)
+                ''', (str(channel_id) if channel_id else None, channel, group_id, datetime.now()))
                 
                 bot.reply_to(
                     message,
                     language_service.get_text('channel_added', message.chat.id, channel=channel)
                 )
                 logger.info(f"Канал {channel} добавлен в группу {group_id}")
+            
+            group_policies.invalidate(group_id)
                 
         except Exception as e:
             logger.error(f"Ошибка в /add_one: {e}")
@@ -128,10 +137,14 @@ def register_handlers(bot: TeleBot):
                 # Добавляем каналы
                 added = []
                 for channel in channels:
+                    channel_id = get_channel_id_by_username(bot, channel)
+                    if channel_id is None:
+                        logger.warning(f"Не удалось получить ID канала {channel}, он будет получен при проверке")
+                    
                     cursor.execute('''
-                        INSERT INTO channels (channel_username, group_id, added_date, is_active)
-                        VALUES (?, ?, ?, 1)
-                    ''', (channel, group_id, datetime.now()))
+                        INSERT INTO channels (channel_id, channel_username, group_id, added_date, is_active)
+                        VALUES (?, ?, ?, ?, 1)
+                    ''', (str(channel_id) if channel_id else None, channel, group_id, datetime.now()))
                     added.append(channel)
                 
                 bot.reply_to(
@@ -140,6 +153,8 @@ def register_handlers(bot: TeleBot):
                                             channels=', '.join(added))
                 )
                 logger.info(f"Каналы {added} добавлены в группу {group_id}")
+            
+            group_policies.invalidate(group_id)
                 
         except Exception as e:
             logger.error(f"Ошибка в /add_channels: {e}")
@@ -184,12 +199,15 @@ def register_handlers(bot: TeleBot):
                                                     end=end_date.strftime('%d.%m.%Y %H:%M'))
                         )
                         logger.info(f"Установлено время для {channel}: до {end_date}")
+                        scheduler.notify(end_date)
                     else:
                         bot.reply_to(
                             message,
                             language_service.get_text('channel_not_found', message.chat.id, 
                                                     channel=channel)
                         )
+                
+                group_policies.invalidate(group_id)
                 return
             
             # Формат с длительностью для всех каналов
@@ -213,11 +231,14 @@ def register_handlers(bot: TeleBot):
                                                     end=end_date.strftime('%d.%m.%Y %H:%M'))
                         )
                         logger.info(f"Установлено время для {updated} каналов: до {end_date}")
+                        scheduler.notify(end_date)
                     else:
                         bot.reply_to(
                             message,
                             language_service.get_text('add_time_usage', message.chat.id)
                         )
+                
+                group_policies.invalidate(group_id)
                 return
             
             bot.reply_to(
@@ -288,6 +309,8 @@ def register_handlers(bot: TeleBot):
                     language_service.get_text('auto_del_set', message.chat.id, time=time_str)
                 )
                 logger.info(f"Автоудаление в группе {group_id} установлено на {seconds}с")
+            
+            group_policies.invalidate(group_id)
                 
         except IndexError:
             bot.reply_to(
@@ -347,6 +370,8 @@ def register_handlers(bot: TeleBot):
                         language_service.get_text('channel_not_found', message.chat.id, 
                                                 channel=channel)
                     )
+            
+            group_policies.invalidate(group_id)
                     
         except Exception as e:
             logger.error(f"Ошибка в /del_one: {e}")
@@ -380,6 +405,8 @@ def register_handlers(bot: TeleBot):
                 language_service.get_text('channels_deleted', message.chat.id, count=count)
             )
             logger.info(f"Удалено {count} каналов из группы {group_id}")
+        
+        group_policies.invalidate(group_id)
 
     @bot.message_handler(commands=['status'])
     @owner_only
@@ -412,11 +439,16 @@ def register_handlers(bot: TeleBot):
                 ''', (group_id,))
                 channels = cursor.fetchall()
                 
-                # VIP пользователи
+                # VIP пользователи: локальные VIP группы и глобальные отдельными ветками,
+                # условие с OR по разным колонкам не обслуживается одним индексом
+                now = datetime.now()
                 cursor.execute('''
-                    SELECT * FROM vip_users WHERE (group_id = ? OR scope = 'global')
+                    SELECT * FROM vip_users WHERE scope = 'local' AND group_id = ?
                     AND (end_date IS NULL OR end_date > ?)
-                ''', (group_id, datetime.now()))
+                    UNION ALL
+                    SELECT * FROM vip_users WHERE scope = 'global'
+                    AND (end_date IS NULL OR end_date > ?)
+                ''', (group_id, now, now))
                 vips = cursor.fetchall()
                 
                 # Муты
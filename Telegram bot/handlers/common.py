@@ -40,6 +40,7 @@ def register_handlers(bot: TeleBot):
 /group @группа - Выбрать группу
 /group_list - Список всех групп
 /scan_groups - Найти все группы
+/db_stats - Самые затратные запросы к БД
 
 📢 **Управление каналами:**
 /add_one @канал - Добавить канал
@@ -75,6 +76,7 @@ def register_handlers(bot: TeleBot):
 /group @group - Select group
 /group_list - List all groups
 /scan_groups - Find all groups
+/db_stats - Most expensive DB queries
 
 📢 **Channel Management:**
 /add_one @channel - Add channel
@@ -3,6 +3,10 @@ from telebot.types import Message, ChatMemberUpdated
 from database import db
 from services.subscription_checker import SubscriptionChecker
 from services.vip_service import VIPService
+from services.membership_cache import membership_cache
+from services.group_policy import group_policies
+from services.admin_cache import admin_cache
+from services.runtime import runtime
 from datetime import datetime
 import logging
 
@@ -16,9 +20,15 @@ def register_handlers(bot: TeleBot):
     def on_chat_member_update(update: ChatMemberUpdated):
         """Обработчик изменения статуса участников чата"""
         try:
+            # Статус участника изменился - сбрасываем кэш подписки
+            membership_cache.invalidate_chat_member(update.chat, update.new_chat_member.user.id)
+            
+            # Поддерживаем список администраторов группы в актуальном состоянии
+            admin_cache.update_member(update.chat.id, update.new_chat_member.user.id,
+                                      update.new_chat_member.status)
+            
             # Проверяем, что изменение касается самого бота
-            bot_user = bot.get_me()
-            if update.new_chat_member.user.id != bot_user.id:
+            if update.new_chat_member.user.id != runtime.bot_id:
                 return
             
             old_status = update.old_chat_member.status
@@ -40,6 +50,7 @@ def register_handlers(bot: TeleBot):
                         INSERT OR REPLACE INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
                         VALUES (?, ?, ?, ?, 30)
                     ''', (chat_id, chat_title, chat_username, datetime.now()))
+                group_policies.invalidate(chat_id)
                 
                 # Уведомляем владельца
                 from config import OWNER_ID
@@ -60,6 +71,7 @@ def register_handlers(bot: TeleBot):
             
             # Бот был удален из группы
             elif old_status in ['member', 'administrator'] and new_status in ['left', 'kicked']:
+                admin_cache.invalidate(chat.id)
                 logger.info(f"❌ Бот удален из группы {chat.id}")
                 
         except Exception as e:
@@ -69,10 +81,8 @@ def register_handlers(bot: TeleBot):
     def on_new_chat_members(message: Message):
         """Обработчик новых участников (запасной вариант)"""
         try:
-            bot_user = bot.get_me()
-            
             for new_member in message.new_chat_members:
-                if new_member.id == bot_user.id:
+                if new_member.id == runtime.bot_id:
                     chat = message.chat
                     chat_id = chat.id
                     chat_title = chat.title or "Без названия"
@@ -87,6 +97,7 @@ def register_handlers(bot: TeleBot):
                             INSERT OR REPLACE INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
                             VALUES (?, ?, ?, ?, 30)
                         ''', (chat_id, chat_title, chat_username, datetime.now()))
+                    group_policies.invalidate(chat_id)
                     
                     # Уведомляем владельца
                     from config import OWNER_ID
@@ -115,18 +126,18 @@ def register_handlers(bot: TeleBot):
         
         try:
             # Проверяем, есть ли группа в БД (если нет - добавляем)
-            with db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM groups WHERE group_id = ?', (message.chat.id,))
-                group = cursor.fetchone()
-                
-                if not group:
-                    # Автоматически добавляем группу в БД
+            policy = group_policies.get(message.chat.id)
+            
+            if not policy.exists:
+                # Автоматически добавляем группу в БД
+                with db.get_connection() as conn:
+                    cursor = conn.cursor()
                     cursor.execute('''
                         INSERT OR REPLACE INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
                         VALUES (?, ?, ?, ?, 30)
                     ''', (message.chat.id, message.chat.title, message.chat.username, datetime.now()))
-                    logger.info(f"✅ Группа {message.chat.title} автоматически добавлена в БД")
+                group_policies.invalidate(message.chat.id)
+                logger.info(f"✅ Группа {message.chat.title} автоматически добавлена в БД")
             
             # Проверка на команды из черного списка
             if message.text and message.text.startswith('/'):
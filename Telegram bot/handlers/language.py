@@ -2,6 +2,7 @@ from telebot import TeleBot
 from telebot.types import Message
 from utils.decorators import owner_only
 from services.language_service import language_service
+from services.group_policy import group_policies
 import logging
 
 logger = logging.getLogger(__name__)
@@ -40,6 +41,8 @@ def register_handlers(bot: TeleBot):
                     return
                 
                 if language_service.set_chat_language(message.chat.id, lang):
+                    group_policies.invalidate(message.chat.id)
+                    
                     # Отправляем подтверждение на новом языке
                     response = language_service.get_text('language_set', message.chat.id)
                     bot.reply_to(message, response)
@@ -5,6 +5,8 @@ from utils.decorators import owner_only
 from utils.helpers import get_user_id_by_username, get_selected_group
 from services.vip_service import VIPService
 from services.language_service import language_service
+from services.scheduler import scheduler
+from services.outbound import OutboundDropped, low_priority
 from config import VIOLATION_LEVELS
 from datetime import datetime, timedelta
 import time
@@ -12,93 +14,116 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def register_handlers(bot: TeleBot):
+def handle_blacklist_command(bot: TeleBot, message: Message):
+    """Обрабатывает команды из черного списка"""
     vip_service = VIPService(bot)
+    user_id = message.from_user.id
+    group_id = message.chat.id
+    username = message.from_user.username or message.from_user.first_name
     
-    def handle_blacklist_command(bot: TeleBot, message: Message):
-        """Обрабатывает команды из черного списка"""
-        user_id = message.from_user.id
-        group_id = message.chat.id
-        username = message.from_user.username or message.from_user.first_name
-        
-        # Проверяем иммунитет у VIP PLUS
-        if vip_service.has_immunity_to_mute(user_id, group_id):
-            return False
-        
-        # Удаляем сообщение с командой
+    # Проверяем иммунитет у VIP PLUS
+    if vip_service.has_immunity_to_mute(user_id, group_id):
+        return False
+    
+    # Удаляем сообщение с командой
+    try:
+        bot.delete_message(group_id, message.message_id)
+    except Exception as e:
+        logger.error(f"Ошибка удаления сообщения: {e}")
+    
+    # Получаем текущий статус нарушений
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM muted_users 
+            WHERE user_id = ? AND group_id = ?
+        ''', (user_id, group_id))
+        muted = cursor.fetchone()
+    
+    if muted:
+        violations = muted['violations'] + 1
+        if violations > 4:
+            violations = 4
+    else:
+        violations = 1
+    
+    level = VIOLATION_LEVELS.get(violations, VIOLATION_LEVELS[4])
+    
+    # Запросы к Bot API выполняются вне транзакции: ожидание лимитов и повторы
+    # не должны держать блокировку записи SQLite для других линий
+    if violations == 1:
+        # Отправляем предупреждение (низкий приоритет, при перегрузке отбрасывается)
         try:
-            bot.delete_message(group_id, message.message_id)
+            warning = language_service.get_text('blacklist_warning', group_id, username=username)
+            with low_priority():
+                bot.send_message(group_id, warning, reply_to_message_id=message.message_id)
+        except OutboundDropped:
+            logger.info(f"Предупреждение о черном списке в группе {group_id} пропущено из-за лимита отправки")
         except Exception as e:
-            logger.error(f"Ошибка удаления сообщения: {e}")
+            logger.error(f"Ошибка отправки предупреждения: {e}")
         
+        # Первое нарушение сохраняется без срока мута до /off_mute или /del_all_mute,
+        # поэтому следующая команда из черного списка уже приводит к муту
         with db.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Получаем текущий статус нарушений
+            conn.cursor().execute('''
+                INSERT OR IGNORE INTO muted_users (user_id, username, group_id, mute_time, mute_end, violations)
+                VALUES (?, ?, ?, NULL, NULL, 1)
+            ''', (user_id, username, group_id))
+        return True
+    
+    mute_time = level['mute_time']
+    mute_end = datetime.now() + timedelta(seconds=mute_time)
+    
+    # Мутим пользователя
+    try:
+        bot.restrict_chat_member(
+            group_id,
+            user_id,
+            permissions=ChatPermissions(can_send_messages=False),
+            until_date=int(time.time()) + mute_time
+        )
+    except Exception as e:
+        logger.error(f"Ошибка мута: {e}")
+        return True
+    
+    hours = mute_time // 3600
+    minutes = (mute_time % 3600) // 60
+    
+    if hours > 0:
+        time_text = f"{hours}ч {minutes}м"
+    else:
+        time_text = f"{minutes}м"
+    
+    # Уведомление необязательно: мут уже выдан, при исчерпанном лимите чата оно отбрасывается
+    try:
+        warning = language_service.get_text('mute_message', group_id, username=username, time=time_text)
+        with low_priority():
+            bot.send_message(group_id, warning)
+    except OutboundDropped:
+        logger.info(f"Уведомление о муте в группе {group_id} пропущено из-за лимита отправки")
+    except Exception as e:
+        logger.error(f"Ошибка отправки уведомления о муте: {e}")
+    
+    # Сохраняем в БД
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        if muted:
             cursor.execute('''
-                SELECT * FROM muted_users 
+                UPDATE muted_users SET 
+                    violations = ?,
+                    mute_end = ?
                 WHERE user_id = ? AND group_id = ?
-            ''', (user_id, group_id))
-            
-            muted = cursor.fetchone()
-            
-            if muted:
-                violations = muted['violations'] + 1
-                if violations > 4:
-                    violations = 4
-            else:
-                violations = 1
-            
-            level = VIOLATION_LEVELS.get(violations, VIOLATION_LEVELS[4])
-            
-            # Отправляем предупреждение
-            if violations == 1:
-                warning = language_service.get_text('blacklist_warning', group_id, username=username)
-                bot.send_message(group_id, warning, reply_to_message_id=message.message_id)
-                
-            elif violations >= 2:
-                mute_time = level['mute_time']
-                mute_end = datetime.now() + timedelta(seconds=mute_time)
-                
-                # Мутим пользователя
-                try:
-                    bot.restrict_chat_member(
-                        group_id,
-                        user_id,
-                        permissions=ChatPermissions(can_send_messages=False),
-                        until_date=int(time.time()) + mute_time
-                    )
-                    
-                    hours = mute_time // 3600
-                    minutes = (mute_time % 3600) // 60
-                    
-                    if hours > 0:
-                        time_text = f"{hours}ч {minutes}м"
-                    else:
-                        time_text = f"{minutes}м"
-                    
-                    warning = language_service.get_text('mute_message', group_id, username=username, time=time_text)
-                    bot.send_message(group_id, warning)
-                    
-                    # Сохраняем в БД
-                    if muted:
-                        cursor.execute('''
-                            UPDATE muted_users SET 
-                                violations = ?,
-                                mute_end = ?
-                            WHERE user_id = ? AND group_id = ?
-                        ''', (violations, mute_end, user_id, group_id))
-                    else:
-                        cursor.execute('''
-                            INSERT INTO muted_users (user_id, username, group_id, mute_time, mute_end, violations)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (user_id, username, group_id, datetime.now(), mute_end, violations))
-                        
-                except Exception as e:
-                    logger.error(f"Ошибка мута: {e}")
-            
-            return True
+            ''', (violations, mute_end, user_id, group_id))
+        else:
+            cursor.execute('''
+                INSERT INTO muted_users (user_id, username, group_id, mute_time, mute_end, violations)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, username, group_id, datetime.now(), mute_end, violations))
     
+    scheduler.notify(mute_end)
+    return True
+
+def register_handlers(bot: TeleBot):
     @bot.message_handler(commands=['mute_status'])
     @owner_only
     def mute_status(message: Message):
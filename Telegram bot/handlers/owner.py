@@ -4,6 +4,7 @@ from database import db
 from utils.decorators import owner_only
 from config import OWNER_ID
 from services.language_service import language_service
+from services.group_policy import group_policies
 from datetime import datetime
 import logging
 
@@ -40,54 +41,61 @@ def register_handlers(bot: TeleBot):
                     ''', (f'%{group_query}%', f'%{group_query}%'))
                 
                 groups = cursor.fetchall()
+            
+            if not groups:
+                # Пробуем получить группу напрямую из Telegram (вне транзакции)
+                try:
+                    chat = bot.get_chat(f"@{group_query}")
+                except:
+                    text = language_service.get_text('group_not_found', message.chat.id)
+                    bot.reply_to(message, text)
+                    return
                 
-                if not groups:
-                    # Пробуем получить группу напрямую из Telegram
-                    try:
-                        chat = bot.get_chat(f"@{group_query}")
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
-                            VALUES (?, ?, ?, ?, 30)
-                        ''', (chat.id, chat.title, chat.username, datetime.now()))
-                        
-                        group_id = chat.id
-                        group_title = chat.title
-                        
-                        # Сохраняем выбранную группу
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO owner_selected_group (owner_id, selected_group_id) 
-                            VALUES (?, ?)
-                        ''', (OWNER_ID, group_id))
-                        
-                        text = language_service.get_text('group_selected', message.chat.id, 
-                                                        group_title=group_title)
-                        bot.reply_to(message, text)
-                        logger.info(f"✅ Добавлена и выбрана группа: {group_title} ({group_id})")
-                        return
-                    except:
-                        text = language_service.get_text('group_not_found', message.chat.id)
-                        bot.reply_to(message, text)
-                        return
+                group_id = chat.id
+                group_title = chat.title
                 
-                if len(groups) == 1:
-                    group_id = groups[0][0]
-                    group_title = groups[0][1]
+                with db.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
+                        VALUES (?, ?, ?, ?, 30)
+                    ''', (chat.id, chat.title, chat.username, datetime.now()))
                     
+                    # Сохраняем выбранную группу
                     cursor.execute('''
                         INSERT OR REPLACE INTO owner_selected_group (owner_id, selected_group_id) 
                         VALUES (?, ?)
                     ''', (OWNER_ID, group_id))
-                    
-                    text = language_service.get_text('group_selected', message.chat.id, 
-                                                    group_title=group_title)
-                    bot.reply_to(message, text)
-                    logger.info(f"✅ Выбрана группа: {group_title} ({group_id})")
-                else:
-                    groups_list = "\n".join([f"🔹 {g[1]} (ID: {g[0]})" for g in groups])
-                    text = language_service.get_text('multiple_groups', message.chat.id, 
-                                                    groups_list=groups_list)
-                    bot.reply_to(message, text)
-                    
+                # Снимок перестраивается после коммита, иначе он перечитает старую строку
+                group_policies.invalidate(group_id)
+                
+                text = language_service.get_text('group_selected', message.chat.id, 
+                                                group_title=group_title)
+                bot.reply_to(message, text)
+                logger.info(f"✅ Добавлена и выбрана группа: {group_title} ({group_id})")
+                return
+            
+            if len(groups) == 1:
+                group_id = groups[0][0]
+                group_title = groups[0][1]
+                
+                with db.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO owner_selected_group (owner_id, selected_group_id) 
+                        VALUES (?, ?)
+                    ''', (OWNER_ID, group_id))
+                
+                text = language_service.get_text('group_selected', message.chat.id, 
+                                                group_title=group_title)
+                bot.reply_to(message, text)
+                logger.info(f"✅ Выбрана группа: {group_title} ({group_id})")
+            else:
+                groups_list = "\n".join([f"🔹 {g[1]} (ID: {g[0]})" for g in groups])
+                text = language_service.get_text('multiple_groups', message.chat.id, 
+                                                groups_list=groups_list)
+                bot.reply_to(message, text)
+                
         except Exception as e:
             logger.error(f"❌ Ошибка в /group: {e}")
             text = language_service.get_text('error_occurred', message.chat.id, error=str(e))
@@ -138,6 +146,33 @@ def register_handlers(bot: TeleBot):
             logger.error(f"❌ Ошибка в /group_list: {e}")
             bot.reply_to(message, f"❌ Ошибка: {e}")
     
+    @bot.message_handler(commands=['db_stats'])
+    @owner_only
+    def db_stats(message: Message):
+        """Самые затратные запросы к БД по суммарному времени"""
+        try:
+            stats = db.get_statement_stats(limit=10)
+            
+            if not stats:
+                bot.reply_to(message, "📊 Запросов к БД пока не было.")
+                return
+            
+            text = "📊 **ТОП ЗАПРОСОВ К БД:**\n\n"
+            for i, item in enumerate(stats, 1):
+                statement = item['statement'].replace('`', "'")
+                if len(statement) > 200:
+                    statement = statement[:200] + '...'
+                
+                text += f"{i}. `{statement}`\n"
+                text += f"   Вызовов: {item['calls']}, всего: {item['total_ms']} мс\n"
+                text += f"   Среднее: {item['avg_ms']} мс, макс: {item['max_ms']} мс, строк: {item['rows']}\n\n"
+            
+            bot.send_message(message.chat.id, text, parse_mode="Markdown")
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка в /db_stats: {e}")
+            bot.reply_to(message, f"❌ Ошибка: {e}")
+    
     @bot.message_handler(commands=['scan_groups'])
     @owner_only
     def scan_groups(message: Message):
@@ -164,6 +199,7 @@ def register_handlers(bot: TeleBot):
                                 INSERT OR REPLACE INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
                                 VALUES (?, ?, ?, ?, 30)
                             ''', (chat.id, chat.title, chat.username, datetime.now()))
+                        group_policies.invalidate(chat.id)
                         found += 1
                         logger.info(f"✅ Найдена группа из сообщения: {chat.title}")
                 
@@ -179,6 +215,7 @@ def register_handlers(bot: TeleBot):
                                 INSERT OR REPLACE INTO groups (group_id, group_title, group_username, added_date, auto_del_time)
                                 VALUES (?, ?, ?, ?, 30)
                             ''', (chat.id, chat.title, chat.username, datetime.now()))
+                        group_policies.invalidate(chat.id)
                         found += 1
                         logger.info(f"✅ Найдена группа из chat_member: {chat.title}")
             
@@ -5,7 +5,9 @@ from utils.decorators import owner_only
 from utils.helpers import get_user_id_by_username, get_group_id_by_username
 from utils.time_parser import parse_duration_to_end
 from services.vip_service import VIPService
+from services.vip_index import vip_index
 from services.language_service import language_service
+from services.scheduler import scheduler
 from datetime import datetime
 import logging
 
@@ -35,6 +37,9 @@ def register_handlers(bot: TeleBot):
                     INSERT INTO vip_users (user_id, username, vip_type, scope, start_date)
                     VALUES (?, ?, 'VIP', 'global', ?)
                 ''', (user_id, username, datetime.now()))
+                row_id = cursor.lastrowid
+            
+            vip_index.add(row_id, user_id, username, 'VIP', 'global')
             
             bot.reply_to(
                 message,
@@ -81,6 +86,9 @@ def register_handlers(bot: TeleBot):
                     INSERT INTO vip_users (user_id, username, vip_type, scope, start_date)
                     VALUES (?, ?, 'VIP_PLUS', 'global', ?)
                 ''', (user_id, username, datetime.now()))
+                row_id = cursor.lastrowid
+            
+            vip_index.add(row_id, user_id, username, 'VIP_PLUS', 'global')
             
             bot.reply_to(
                 message,
@@ -146,6 +154,9 @@ def register_handlers(bot: TeleBot):
                     INSERT INTO vip_users (user_id, username, vip_type, scope, group_id, start_date)
                     VALUES (?, ?, 'VIP', 'local', ?, ?)
                 ''', (user_id, username, group_id, datetime.now()))
+                row_id = cursor.lastrowid
+            
+            vip_index.add(row_id, user_id, username, 'VIP', 'local', group_id)
             
             bot.reply_to(
                 message,
@@ -210,6 +221,10 @@ def register_handlers(bot: TeleBot):
                     INSERT INTO vip_users (user_id, username, vip_type, scope, start_date, end_date)
                     VALUES (?, ?, 'VIP', 'global', ?, ?)
                 ''', (user_id, username, datetime.now(), end_date))
+                row_id = cursor.lastrowid
+            
+            vip_index.add(row_id, user_id, username, 'VIP', 'global', end_date=end_date)
+            scheduler.notify(end_date)
             
             bot.reply_to(
                 message,
@@ -236,17 +251,19 @@ def register_handlers(bot: TeleBot):
                     DELETE FROM vip_users 
                     WHERE username = ? AND vip_type = 'VIP'
                 ''', (username,))
-                
-                if cursor.rowcount > 0:
-                    bot.reply_to(
-                        message,
-                        language_service.get_text('vip_removed', message.chat.id, username=username)
-                    )
-                else:
-                    bot.reply_to(
-                        message,
-                        language_service.get_text('vip_not_found', message.chat.id, username=username)
-                    )
+                removed = cursor.rowcount > 0
+            
+            if removed:
+                vip_index.remove('VIP', username)
+                bot.reply_to(
+                    message,
+                    language_service.get_text('vip_removed', message.chat.id, username=username)
+                )
+            else:
+                bot.reply_to(
+                    message,
+                    language_service.get_text('vip_not_found', message.chat.id, username=username)
+                )
                     
         except IndexError:
             bot.reply_to(
@@ -273,17 +290,19 @@ def register_handlers(bot: TeleBot):
                     DELETE FROM vip_users 
                     WHERE username = ? AND vip_type = 'VIP_PLUS'
                 ''', (username,))
-                
-                if cursor.rowcount > 0:
-                    bot.reply_to(
-                        message,
-                        language_service.get_text('vip_plus_removed', message.chat.id, username=username)
-                    )
-                else:
-                    bot.reply_to(
-                        message,
-                        language_service.get_text('vip_plus_not_found', message.chat.id, username=username)
-                    )
+                removed = cursor.rowcount > 0
+            
+            if removed:
+                vip_index.remove('VIP_PLUS', username)
+                bot.reply_to(
+                    message,
+                    language_service.get_text('vip_plus_removed', message.chat.id, username=username)
+                )
+            else:
+                bot.reply_to(
+                    message,
+                    language_service.get_text('vip_plus_not_found', message.chat.id, username=username)
+                )
                     
         except IndexError:
             bot.reply_to(
@@ -305,11 +324,12 @@ def register_handlers(bot: TeleBot):
             cursor = conn.cursor()
             cursor.execute("DELETE FROM vip_users WHERE vip_type = 'VIP'")
             count = cursor.rowcount
-            
-            bot.reply_to(
-                message,
-                language_service.get_text('vip_all_removed', message.chat.id, count=count)
-            )
+        
+        vip_index.remove('VIP')
+        bot.reply_to(
+            message,
+            language_service.get_text('vip_all_removed', message.chat.id, count=count)
+        )
 
     @bot.message_handler(commands=['del_all_VIPPLUS'])
     @owner_only
@@ -319,8 +339,9 @@ def register_handlers(bot: TeleBot):
             cursor = conn.cursor()
             cursor.execute("DELETE FROM vip_users WHERE vip_type = 'VIP_PLUS'")
             count = cursor.rowcount
-            
-            bot.reply_to(
-                message,
-                language_service.get_text('vip_plus_all_removed', message.chat.id, count=count)
-            )
\ No newline at end of file
+        
+        vip_index.remove('VIP_PLUS')
+        bot.reply_to(
+            message,
+            language_service.get_text('vip_plus_all_removed', message.chat.id, count=count)
+        )
\ No newline at end of file
@@ -1,2 +1,45 @@
 # Пакет locales
-from . import ru, en
\ No newline at end of file
+import string
+from typing import Dict, Tuple
+from . import ru, en
+
+# Доступные языки: код -> словарь переводов
+LANGUAGES = {
+    'ru': ru.TRANSLATIONS,
+    'en': en.TRANSLATIONS
+}
+
+DEFAULT_LANGUAGE = 'ru'
+
+class Template:
+    """Перевод с заранее разобранными полями подстановки"""
+    __slots__ = ('text', 'fields')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.fields = frozenset(
+            field.split('.')[0].split('[')[0]
+            for _, field, _, _ in string.Formatter().parse(text)
+            if field
+        )
+
+    def missing_fields(self, kwargs: dict) -> frozenset:
+        """Возвращает поля шаблона, для которых не передано значение"""
+        return self.fields.difference(kwargs)
+
+    def render(self, kwargs: dict) -> str:
+        """Подставляет значения (все поля должны быть переданы)"""
+        if not self.fields:
+            return self.text
+        return self.text.format_map(kwargs)
+
+def compile_translations() -> Dict[Tuple[str, str], Template]:
+    """Собирает плоскую таблицу (язык, ключ) -> шаблон"""
+    return {
+        (lang, key): Template(text)
+        for lang, translations in LANGUAGES.items()
+        for key, text in translations.items()
+    }
+
+# Шаблоны компилируются один раз при импорте
+TEMPLATES = compile_translations()
\ No newline at end of file
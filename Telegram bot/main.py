@@ -5,9 +5,14 @@ import logging
 import time
 import os
 import sys
-from telebot import TeleBot
-from config import BOT_TOKEN, LOG_LEVEL, DEBUG, OWNER_ID
+from telebot import TeleBot, util, apihelper
+from config import (
+    BOT_TOKEN, LOG_LEVEL, DEBUG, OWNER_ID, BOT_API_URL, FLASK_PORT,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET
+)
 from database import db
+from services.group_policy import group_policies
+from services.http_transport import http_transport
 from datetime import datetime
 
 # Настройка логирования
@@ -19,7 +24,16 @@ logger = logging.getLogger(__name__)
 
 # Инициализация бота
 try:
-    bot = TeleBot(BOT_TOKEN)
+    if BOT_API_URL:
+        # Локальный сервер Bot API или тестовый стенд вместо api.telegram.org
+        apihelper.API_URL = BOT_API_URL.rstrip('/') + '/bot{0}/{1}'
+        logger.info(f"🔌 Сервер Bot API: {BOT_API_URL}")
+    
+    # Общий пул HTTP соединений и таймауты по методам для всех запросов к Bot API
+    http_transport.install()
+    
+    # Обработчики выполняются в линиях диспетчера (services/dispatcher.py)
+    bot = TeleBot(BOT_TOKEN, threaded=False)
     logger.info("✅ Бот успешно инициализирован")
 except Exception as e:
     logger.error(f"❌ Ошибка инициализации бота: {e}")
@@ -40,7 +54,17 @@ from handlers import (
 
 # Импорт сервисов
 from services.scheduler import scheduler
+from services.auto_delete import auto_delete_queue
+from services.vip_index import vip_index
+from services.runtime import runtime
+from services.webhook import update_queue
+from services.dispatcher import dispatcher
+from services.outbound import outbound
+from services.api_retry import api_retry, get_retry_after, backoff_delay
+from services.metrics import metrics
+from services.profiler import profiler
 from services.language_service import language_service
+from services.update_recorder import update_recorder
 
 def register_all_handlers():
     """Регистрирует все обработчики"""
@@ -67,8 +91,8 @@ def check_existing_groups():
     try:
         logger.info("🔍 Проверка существующих групп...")
         
-        # Получаем информацию о боте
-        bot_info = bot.get_me()
+        # Информация о боте уже получена при запуске
+        bot_info = runtime.me
         logger.info(f"🤖 Бот: @{bot_info.username} (ID: {bot_info.id})")
         
         # Получаем обновления за последние 24 часа
@@ -117,7 +141,9 @@ def check_existing_groups():
                             WHERE group_id = ?
                         ''', (chat.title, chat.username, chat_id))
                         logger.info(f"🔄 Обновлена информация о группе: {chat.title}")
-                        
+                
+                group_policies.invalidate(chat_id)
+            
             except Exception as e:
                 logger.error(f"❌ Ошибка при обработке группы {chat_id}: {e}")
         
@@ -128,7 +154,7 @@ def check_existing_groups():
 
 # Flask для Replit (keep-alive)
 try:
-    from flask import Flask
+    from flask import Flask, Response, request, jsonify
     from threading import Thread
     
     app = Flask('')
@@ -141,20 +167,71 @@ try:
     def health():
         return "OK", 200
     
+    @app.route('/stats/lanes')
+    def lane_stats():
+        return jsonify(dispatcher.stats())
+    
+    @app.route('/stats/http')
+    def http_stats():
+        return jsonify(http_transport.stats())
+    
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
+    if BOT_MODE == 'webhook':
+        @app.route(WEBHOOK_PATH, methods=['POST'])
+        def webhook():
+            """Принимает обновление от Telegram и сразу отвечает"""
+            if not update_queue.check_secret(request.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+                logger.warning(f"⚠️ Webhook запрос с неверным секретом от {request.remote_addr}")
+                return "Forbidden", 403
+            
+            if not update_queue.put(request.get_data(as_text=True)):
+                logger.warning("⚠️ Очередь webhook переполнена, обновление отклонено")
+                return "Queue is full", 503
+            
+            return "OK", 200
+    
     def run_flask():
-        app.run(host='0.0.0.0', port=8080)
+        app.run(host='0.0.0.0', port=FLASK_PORT)
     
     def keep_alive():
         t = Thread(target=run_flask)
         t.daemon = True
         t.start()
-        logger.info("🌐 Flask сервер запущен на порту 8080")
+        logger.info(f"🌐 Flask сервер запущен на порту {FLASK_PORT}")
         
 except ImportError:
+    if BOT_MODE == 'webhook':
+        logger.critical("❌ Для режима webhook нужен Flask")
+        sys.exit(1)
     logger.warning("⚠️ Flask не установлен, keep-alive отключен")
     def keep_alive():
         pass
 
+def run_webhook():
+    """Регистрирует webhook; Flask передает обновления в линии диспетчера"""
+    url = WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH
+    
+    while True:
+        try:
+            # chat_member не приходит без явного указания в allowed_updates
+            bot.set_webhook(
+                url=url,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=util.update_types
+            )
+            logger.info(f"🌐 Webhook установлен: {url}")
+            break
+        except Exception as e:
+            logger.error(f"❌ Ошибка установки webhook: {e}")
+            time.sleep(5)
+    
+    # Обновления принимает Flask, основной поток просто ждет
+    while True:
+        time.sleep(3600)
+
 def main():
     """Главная функция запуска бота"""
     logger.info("=" * 60)
@@ -163,20 +240,44 @@ def main():
     logger.info(f"🐍 Python: {sys.version}")
     logger.info("=" * 60)
     
+    # Все запросы к Bot API проходят через шлюз ограничения скорости
+    outbound.install()
+    api_retry.install()
+    
     # Проверка подключения к Telegram
     try:
-        bot_info = bot.get_me()
+        bot_info = runtime.init(bot)
         logger.info(f"✅ Бот авторизован: @{bot_info.username} (ID: {bot_info.id})")
     except Exception as e:
         logger.error(f"❌ Ошибка авторизации бота: {e}")
         logger.error("Проверьте токен в .env файле")
         sys.exit(1)
     
+    # Запись входящих обновлений для воспроизведения (если задан UPDATE_RECORD_PATH)
+    update_recorder.install(bot_info.id)
+    
+    # Планы горячих запросов к БД
+    if DEBUG:
+        db.explain_hot_queries()
+    
+    # Загружаем VIP-права в память
+    vip_index.reload()
+    
     # Регистрируем обработчики
     register_all_handlers()
     
-    # Проверяем существующие группы
-    check_existing_groups()
+    # Обновления одного чата обрабатываются по порядку, разных чатов - параллельно
+    dispatcher.install(bot)
+    
+    # Метрики обработчиков, Bot API и БД для /metrics
+    metrics.install(bot)
+    
+    # Разбивка времени обработчиков и журнал медленных обновлений
+    profiler.install(bot)
+    
+    # Проверяем существующие группы (getUpdates не работает при установленном webhook)
+    if BOT_MODE != 'webhook':
+        check_existing_groups()
     
     # Запускаем планировщик
     try:
@@ -185,6 +286,13 @@ def main():
     except Exception as e:
         logger.error(f"❌ Ошибка запуска планировщика: {e}")
     
+    # Запускаем очередь автоудаления
+    try:
+        auto_delete_queue.set_bot(bot)
+        logger.info("✅ Очередь автоудаления запущена")
+    except Exception as e:
+        logger.error(f"❌ Ошибка запуска очереди автоудаления: {e}")
+    
     # Запускаем Flask сервер для Replit
     keep_alive()
     
@@ -203,8 +311,13 @@ def main():
     
     logger.info("✅ Бот запущен и ожидает сообщения...")
     
-    # Очищаем старые обновления
+    if BOT_MODE == 'webhook':
+        run_webhook()
+        return
+    
+    # Очищаем старые обновления (polling не работает при установленном webhook)
     try:
+        bot.remove_webhook()
         bot.get_updates(offset=-1)
         logger.info("✅ Кэш обновлений очищен")
     except:
@@ -219,18 +332,27 @@ def main():
             if DEBUG:
                 logger.info("🔄 Запуск polling в режиме отладки")
             
-            bot.polling(none_stop=True, interval=1, timeout=30)
+            # chat_member не приходит без явного указания в allowed_updates.
+            # Паузы между запросами не нужны: getUpdates сам ждет до timeout секунд
+            bot.polling(none_stop=True, interval=0, timeout=30, allowed_updates=util.update_types)
             
         except Exception as e:
             retry_count += 1
             logger.error(f"❌ Ошибка в polling (попытка {retry_count}): {e}")
             
+            retry_after = get_retry_after(e)
+            if retry_after is not None:
+                # Переподключение раньше retry_after только продлит блокировку
+                delay = retry_after
+            else:
+                delay = 5 + backoff_delay(retry_count, base=2.5)
+            
             if retry_count >= max_retries:
                 logger.critical("❌ Превышено количество попыток переподключения")
-                time.sleep(60)
                 retry_count = 0
             
-            time.sleep(5)
+            logger.info(f"⏳ Повторный запуск polling через {delay:.1f}с")
+            time.sleep(delay)
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,91 @@
+import threading
+import time
+import logging
+from typing import Dict, Set, Tuple
+from telebot import TeleBot
+from config import ADMIN_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+class AdminCache:
+    """
+    Кэш списков администраторов групп.
+    Список загружается одним вызовом get_chat_administrators,
+    обновляется по событиям chat_member и перечитывается по истечении TTL
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.ttl = ADMIN_CACHE_TTL
+        # chat_id -> (множество ID администраторов, время истечения)
+        self._rosters: Dict[int, Tuple[Set[int], float]] = {}
+        # Блокировки загрузки по группам, чтобы не запрашивать один список параллельно
+        self._fetch_locks: Dict[int, threading.Lock] = {}
+        self._fetch_locks_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_admin(self, bot: TeleBot, chat_id: int, user_id: int) -> bool:
+        """
+        Проверяет, является ли пользователь администратором группы.
+        Ошибки API пробрасываются вызывающему коду
+        """
+        return user_id in self.get_admins(bot, chat_id)
+
+    def get_admins(self, bot: TeleBot, chat_id: int) -> Set[int]:
+        """Возвращает ID администраторов группы, при необходимости загружая список"""
+        roster = self._rosters.get(chat_id)
+        if roster is not None and roster[1] > time.monotonic():
+            self.hits += 1
+            return roster[0]
+        
+        with self._get_fetch_lock(chat_id):
+            roster = self._rosters.get(chat_id)
+            if roster is not None and roster[1] > time.monotonic():
+                self.hits += 1
+                return roster[0]
+            
+            self.misses += 1
+            admins = {member.user.id for member in bot.get_chat_administrators(chat_id)}
+            self._rosters[chat_id] = (admins, time.monotonic() + self.ttl)
+            logger.debug(f"Список администраторов группы {chat_id} загружен: {len(admins)}")
+            return admins
+
+    def update_member(self, chat_id: int, user_id: int, status: str):
+        """Обновляет загруженный список по событию chat_member"""
+        roster = self._rosters.get(chat_id)
+        if roster is None:
+            return
+        
+        admins = set(roster[0])
+        if status in ['administrator', 'creator']:
+            admins.add(user_id)
+        else:
+            admins.discard(user_id)
+        self._rosters[chat_id] = (admins, roster[1])
+
+    def invalidate(self, chat_id: int):
+        """Сбрасывает список администраторов группы"""
+        self._rosters.pop(chat_id, None)
+
+    def _get_fetch_lock(self, chat_id: int) -> threading.Lock:
+        with self._fetch_locks_lock:
+            lock = self._fetch_locks.get(chat_id)
+            if lock is None:
+                lock = self._fetch_locks[chat_id] = threading.Lock()
+            return lock
+
+# Глобальный экземпляр
+admin_cache = AdminCache()
\ No newline at end of file
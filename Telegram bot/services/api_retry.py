@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+import logging
+from typing import Optional
+import requests
+from telebot import apihelper
+from telebot.apihelper import ApiTelegramException, ApiHTTPException
+from config import API_RETRY_MAX_ATTEMPTS, API_RETRY_BASE_DELAY, API_RETRY_BUDGET
+from services.outbound import outbound
+
+logger = logging.getLogger(__name__)
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Возвращает retry_after из ответа 429 или None"""
+    if isinstance(error, ApiTelegramException) and error.error_code == 429:
+        parameters = error.result_json.get('parameters') or {}
+        return float(parameters.get('retry_after', 1))
+    return None
+
+def is_transient(error: Exception) -> bool:
+    """Ошибка временная: сеть, таймаут или 5xx на стороне Telegram"""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, ApiTelegramException):
+        return error.error_code >= 500
+    if isinstance(error, ApiHTTPException):
+        return error.result.status_code >= 500
+    return False
+
+def backoff_delay(attempt: int, base: float = API_RETRY_BASE_DELAY, cap: float = 60) -> float:
+    """Экспоненциальная задержка с джиттером для попытки attempt (начиная с 1)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class ApiRetry:
+    """
+    Повторяет запросы к Bot API поверх шлюза исходящих запросов.
+    429: ждет retry_after (и передает его в корзины шлюза), повторяет любой метод,
+    так как Telegram запрос не выполнил.
+    Сеть и 5xx: повторяет только идемпотентные get-методы с экспоненциальной задержкой.
+    Все попытки укладываются в API_RETRY_BUDGET секунд
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._make_request = None
+        self.retries = 0
+        self.flood_waits = 0
+        self.gave_up = 0
+
+    def install(self):
+        """Подключает повторы (вызывать после outbound.install())"""
+        if self._make_request is not None:
+            return
+        
+        self._make_request = apihelper._make_request
+        apihelper._make_request = self._request
+        logger.info("Повторы запросов к Bot API подключены")
+
+    @staticmethod
+    def is_idempotent(method_name: str) -> bool:
+        # getUpdates повторяет сам цикл polling
+        return method_name.startswith('get') and method_name != 'getUpdates'
+
+    def _request(self, token, method_name, method='get', params=None, files=None):
+        started = time.monotonic()
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            try:
+                # apihelper изменяет params (timeout), поэтому передаем копию
+                return self._make_request(token, method_name, method=method,
+                                          params=dict(params) if params else params, files=files)
+            except Exception as e:
+                retry_after = get_retry_after(e)
+                if retry_after is not None:
+                    self.flood_waits += 1
+                    outbound.penalize(outbound.chat_key_for(method_name, params), retry_after)
+                    delay = retry_after
+                elif is_transient(e) and self.is_idempotent(method_name):
+                    delay = backoff_delay(attempt)
+                else:
+                    raise
+                
+                elapsed = time.monotonic() - started
+                if attempt >= API_RETRY_MAX_ATTEMPTS or elapsed + delay > API_RETRY_BUDGET:
+                    self.gave_up += 1
+                    logger.warning(f"{method_name}: отказ после {attempt} попыток за {elapsed:.1f}с: {e}")
+                    raise
+                
+                self.retries += 1
+                logger.debug(f"{method_name}: повтор через {delay:.2f}с (попытка {attempt}): {e}")
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            'retries': self.retries,
+            'flood_waits': self.flood_waits,
+            'gave_up': self.gave_up
+        }
+
+# Глобальный экземпляр
+api_retry = ApiRetry()
\ No newline at end of file
@@ -0,0 +1,173 @@
+import heapq
+import json
+import threading
+import time
+import logging
+from collections import defaultdict
+from typing import Optional
+from telebot import TeleBot, apihelper
+from database import db
+from services.outbound import with_priority, PRIORITY_LOW
+
+logger = logging.getLogger(__name__)
+
+class AutoDeleteQueue:
+    """
+    Очередь автоудаления сообщений бота.
+    Один поток-обработчик и куча по времени удаления вместо потока на каждое сообщение.
+    Задания хранятся в таблице pending_deletions и переживают перезапуск
+    """
+    _instance = None
+    _lock = threading.Lock()
+    # Максимум сообщений в одном вызове deleteMessages
+    BATCH_SIZE = 100
+    # Сколько держать наступившее удаление, собирая к нему сообщения того же чата
+    COALESCE_WINDOW = 2  # секунд
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.bot: Optional[TeleBot] = None
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        # (время удаления, chat_id, message_id)
+        self._heap = []
+        self._condition = threading.Condition()
+
+    def set_bot(self, bot: TeleBot):
+        """Устанавливает экземпляр бота"""
+        self.bot = bot
+        if not self.running:
+            self.start()
+
+    def start(self):
+        """Загружает сохраненные задания и запускает обработчик"""
+        if self.running:
+            return
+        
+        self._load_pending()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        logger.info(f"Очередь автоудаления запущена, ожидает: {len(self._heap)}")
+
+    def stop(self):
+        """Останавливает обработчик"""
+        with self._condition:
+            self.running = False
+            self._condition.notify()
+        logger.info("Очередь автоудаления остановлена")
+
+    def schedule(self, chat_id: int, message_id: int, delay: float):
+        """Планирует удаление сообщения через delay секунд"""
+        delete_at = time.time() + delay
+        
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO pending_deletions (chat_id, message_id, delete_at)
+                VALUES (?, ?, ?)
+            ''', (chat_id, message_id, delete_at))
+        
+        with self._condition:
+            heapq.heappush(self._heap, (delete_at, chat_id, message_id))
+            # Будим обработчик, только если новое задание стало ближайшим
+            if self._heap[0][0] == delete_at:
+                self._condition.notify()
+
+    def pending_count(self) -> int:
+        """Количество сообщений, ожидающих удаления"""
+        return len(self._heap)
+
+    def _load_pending(self):
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT delete_at, chat_id, message_id FROM pending_deletions')
+            rows = [(row[0], row[1], row[2]) for row in cursor.fetchall()]
+        
+        # Все задания из памяти уже записаны в БД, поэтому таблица - полный список
+        with self._condition:
+            self._heap = rows
+            heapq.heapify(self._heap)
+
+    def _run(self):
+        """
+        Основной цикл: спит до ближайшего срока плюс COALESCE_WINDOW и удаляет все,
+        что наступило за это время. Без окна при равномерном потоке сроки почти
+        не совпадают и deleteMessages получает по одному сообщению
+        """
+        while True:
+            with self._condition:
+                while self.running:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0][0] + self.COALESCE_WINDOW - time.time()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(timeout=delay)
+                
+                if not self.running:
+                    return
+                
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap))
+            
+            try:
+                self._process(due)
+            except Exception as e:
+                logger.error(f"Ошибка в очереди автоудаления: {e}")
+
+    @with_priority(PRIORITY_LOW)
+    def _process(self, due: list):
+        by_chat = defaultdict(list)
+        for _, chat_id, message_id in due:
+            by_chat[chat_id].append(message_id)
+        
+        for chat_id, message_ids in by_chat.items():
+            for i in range(0, len(message_ids), self.BATCH_SIZE):
+                self._delete_batch(chat_id, message_ids[i:i + self.BATCH_SIZE])
+        
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                DELETE FROM pending_deletions WHERE chat_id = ? AND message_id = ?
+            ''', [(chat_id, message_id) for _, chat_id, message_id in due])
+        
+        logger.debug(f"Автоудаление: обработано {len(due)} сообщений в {len(by_chat)} чатах")
+
+    def _delete_batch(self, chat_id: int, message_ids: list):
+        """Удаляет сообщения одного чата, по возможности одним запросом"""
+        if not self.bot:
+            return
+        
+        if len(message_ids) > 1:
+            try:
+                # deleteMessages еще нет в обертках pyTelegramBotAPI 4.14
+                apihelper._make_request(
+                    self.bot.token, 'deleteMessages', method='post',
+                    params={'chat_id': chat_id, 'message_ids': json.dumps(message_ids)}
+                )
+                return
+            except Exception as e:
+                logger.debug(f"deleteMessages не сработал для {chat_id}, удаляем по одному: {e}")
+        
+        for message_id in message_ids:
+            try:
+                self.bot.delete_message(chat_id, message_id)
+            except Exception as e:
+                logger.error(f"Ошибка автоудаления: {e}")
+
+# Глобальный экземпляр
+auto_delete_queue = AutoDeleteQueue()
@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+import logging
+from typing import Optional, List, Dict
+from telebot import TeleBot
+from telebot.types import Update
+from config import DISPATCHER_LANES, DISPATCHER_LANE_SIZE
+
+logger = logging.getLogger(__name__)
+
+class Lane:
+    """Линия обработки: очередь и поток, выполняющий обновления строго по порядку"""
+    def __init__(self, index: int, maxsize: int):
+        self.index = index
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread: Optional[threading.Thread] = None
+        self.processed = 0
+        self.busy_time = 0.0
+        self.max_depth = 0
+
+class UpdateDispatcher:
+    """
+    Распределяет обновления по линиям по chat.id.
+    Обновления одного чата обрабатываются по порядку (важно для счетчика нарушений и мутов),
+    разные группы обрабатываются параллельно
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.bot: Optional[TeleBot] = None
+        self.lanes: List[Lane] = []
+        self._process = None
+        self.started_at = time.monotonic()
+
+    def install(self, bot: TeleBot, lanes: int = DISPATCHER_LANES):
+        """
+        Подменяет bot.process_new_updates: обновления раскладываются по линиям,
+        а обработчики выполняются в потоках линий (бот должен быть создан с threaded=False)
+        """
+        if self.bot is not None:
+            return
+        
+        self.bot = bot
+        self._process = bot.process_new_updates
+        self.lanes = [Lane(i, DISPATCHER_LANE_SIZE) for i in range(lanes)]
+        for lane in self.lanes:
+            lane.thread = threading.Thread(target=self._worker, args=(lane,),
+                                           name=f'dispatcher-lane-{lane.index}', daemon=True)
+            lane.thread.start()
+        
+        bot.process_new_updates = self.dispatch
+        self.started_at = time.monotonic()
+        logger.info(f"Диспетчер обновлений запущен: {lanes} линий")
+
+    @staticmethod
+    def get_chat_key(update: Update) -> int:
+        """Ключ упорядочивания: ID чата, иначе ID пользователя, иначе ID обновления"""
+        for event in (update.message, update.edited_message, update.channel_post,
+                      update.edited_channel_post, update.my_chat_member,
+                      update.chat_member, update.chat_join_request):
+            if event is not None:
+                return event.chat.id
+        
+        callback = update.callback_query
+        if callback is not None:
+            if callback.message is not None:
+                return callback.message.chat.id
+            return callback.from_user.id
+        
+        for event in (update.inline_query, update.chosen_inline_result,
+                      update.shipping_query, update.pre_checkout_query, update.poll_answer):
+            if event is not None:
+                user = getattr(event, 'from_user', None) or getattr(event, 'user', None)
+                if user is not None:
+                    return user.id
+        
+        return update.update_id
+
+    def dispatch(self, updates: List[Update]):
+        """Раскладывает обновления по линиям (блокируется, если линия переполнена)"""
+        for update in updates:
+            # Polling берет offset из last_update_id, поэтому сдвигаем его сразу
+            if update.update_id > self.bot.last_update_id:
+                self.bot.last_update_id = update.update_id
+            
+            lane = self.lanes[self.get_chat_key(update) % len(self.lanes)]
+            lane.queue.put(update)
+            depth = lane.queue.qsize()
+            if depth > lane.max_depth:
+                lane.max_depth = depth
+
+    def offer(self, update: Update) -> bool:
+        """Кладет обновление в его линию без ожидания. False, если линия заполнена"""
+        lane = self.lanes[self.get_chat_key(update) % len(self.lanes)]
+        try:
+            lane.queue.put_nowait(update)
+        except queue.Full:
+            return False
+        depth = lane.queue.qsize()
+        if depth > lane.max_depth:
+            lane.max_depth = depth
+        return True
+
+    def pending(self) -> int:
+        """Сколько обновлений ждет обработки во всех линиях"""
+        return sum(lane.queue.qsize() for lane in self.lanes)
+
+    def _worker(self, lane: Lane):
+        while True:
+            update = lane.queue.get()
+            started = time.perf_counter()
+            try:
+                self._process([update])
+            except Exception as e:
+                logger.error(f"Ошибка обработки обновления в линии {lane.index}: {e}")
+            finally:
+                lane.busy_time += time.perf_counter() - started
+                lane.processed += 1
+
+    def stats(self) -> List[Dict]:
+        """Глубина очереди, число обработанных обновлений и загрузка каждой линии"""
+        uptime = max(time.monotonic() - self.started_at, 1e-9)
+        return [
+            {
+                'lane': lane.index,
+                'depth': lane.queue.qsize(),
+                'max_depth': lane.max_depth,
+                'processed': lane.processed,
+                'busy_time': round(lane.busy_time, 3),
+                'utilization': round(lane.busy_time / uptime, 4)
+            }
+            for lane in self.lanes
+        ]
+
+# Глобальный экземпляр
+dispatcher = UpdateDispatcher()
\ No newline at end of file
@@ -0,0 +1,133 @@
+import threading
+import logging
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple
+from database import db
+from services.language_service import language_service
+from utils.time_parser import parse_db_timestamp
+
+logger = logging.getLogger(__name__)
+
+class GroupPolicy:
+    """
+    Снимок настроек группы, нужных для обработки каждого сообщения
+    """
+    def __init__(self, group_id: int, exists: bool, channels: List[tuple],
+                 auto_del_time: int, language: str):
+        self.group_id = group_id
+        self.exists = exists
+        # (channel_username, channel_id или None, check_until или None)
+        self.channels = channels
+        self.auto_del_time = auto_del_time
+        self.language = language
+
+    def get_active_channels(self, now: Optional[datetime] = None) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Возвращает каналы, проверка которых еще не истекла, и их сохраненные ID
+        """
+        now = now or datetime.now()
+        channels = []
+        channel_ids = {}
+        
+        for channel, channel_id, check_until in self.channels:
+            if check_until is not None and check_until <= now:
+                continue
+            channels.append(channel)
+            if channel_id is not None:
+                channel_ids[channel] = channel_id
+        
+        return channels, channel_ids
+
+class GroupPolicyCache:
+    """
+    Хранит снимки настроек групп в памяти.
+    Снимок перестраивается только после invalidate()
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._policies: Dict[int, GroupPolicy] = {}
+        self._build_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, group_id: int) -> GroupPolicy:
+        """Возвращает снимок настроек группы, при необходимости загружая его из БД"""
+        policy = self._policies.get(group_id)
+        if policy is not None:
+            self.hits += 1
+            return policy
+        
+        with self._build_lock:
+            policy = self._policies.get(group_id)
+            if policy is None:
+                self.misses += 1
+                policy = self._build(group_id)
+                self._policies[group_id] = policy
+        return policy
+
+    def invalidate(self, group_id: int):
+        """Сбрасывает снимок группы после изменения ее настроек (вызывать после commit)"""
+        with self._build_lock:
+            self._policies.pop(group_id, None)
+        logger.debug(f"Снимок настроек группы {group_id} сброшен")
+
+    def invalidate_all(self):
+        """Сбрасывает все снимки"""
+        with self._build_lock:
+            self._policies.clear()
+
+    @staticmethod
+    def _check_until(group_id: int, channel: str, value) -> Optional[datetime]:
+        """
+        Срок проверки канала. Нераспознанное значение считается истекшим,
+        иначе временная проверка превратилась бы в бессрочную
+        """
+        check_until = parse_db_timestamp(value)
+        if check_until is None and value is not None:
+            logger.warning(f"Некорректный check_until {value!r} у {channel} в группе {group_id}, "
+                           f"проверка считается истекшей")
+            return datetime.min
+        return check_until
+
+    def _build(self, group_id: int) -> GroupPolicy:
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT auto_del_time FROM groups WHERE group_id = ?', (group_id,))
+            group = cursor.fetchone()
+            
+            # Срок проверки фильтруется при каждом сообщении, поэтому берем все активные каналы
+            cursor.execute('''
+                SELECT channel_username, channel_id, check_until FROM channels
+                WHERE group_id = ? AND is_active = 1
+            ''', (group_id,))
+            channels = [
+                (row['channel_username'],
+                 int(row['channel_id']) if row['channel_id'] else None,
+                 self._check_until(group_id, row['channel_username'], row['check_until']))
+                for row in cursor.fetchall()
+            ]
+        
+        return GroupPolicy(
+            group_id=group_id,
+            exists=group is not None,
+            channels=channels,
+            auto_del_time=group['auto_del_time'] if group and group['auto_del_time'] else 0,
+            language=language_service.get_chat_language(group_id)
+        )
+
+# Глобальный экземпляр
+group_policies = GroupPolicyCache()
@@ -0,0 +1,112 @@
+import threading
+import logging
+from typing import Optional, Dict
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from config import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_SIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_METHOD_TIMEOUTS
+)
+
+logger = logging.getLogger(__name__)
+
+class HttpTransport:
+    """
+    HTTP транспорт для Bot API: одна общая сессия с пулом keep-alive соединений
+    вместо отдельной сессии в каждом потоке, раздельные таймауты подключения
+    и чтения и таймауты по методам
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.session: Optional[requests.Session] = None
+        self.adapter: Optional[HTTPAdapter] = None
+        self.requests = 0
+        self.timeouts = 0
+
+    def install(self):
+        """Подключает транспорт к apihelper (вызывать до создания TeleBot)"""
+        if self.session is not None:
+            return
+        
+        # Повторы выполняет services/api_retry, поэтому max_retries=0
+        self.adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_SIZE,
+            max_retries=0,
+            pool_block=False
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        
+        apihelper.session = self.session
+        apihelper.CONNECT_TIMEOUT = HTTP_CONNECT_TIMEOUT
+        apihelper.READ_TIMEOUT = HTTP_READ_TIMEOUT
+        apihelper.CUSTOM_REQUEST_SENDER = self.send
+        logger.info(f"HTTP транспорт подключен: пул {HTTP_POOL_SIZE} соединений")
+
+    @staticmethod
+    def get_timeout(method_name: str, timeout: tuple) -> tuple:
+        """Выбирает (connect, read) таймаут для метода"""
+        connect_timeout, read_timeout = timeout
+        # getUpdates и явно переданный timeout оставляем как есть
+        if method_name == 'getUpdates' or read_timeout != apihelper.READ_TIMEOUT:
+            return connect_timeout, read_timeout
+        return HTTP_CONNECT_TIMEOUT, HTTP_METHOD_TIMEOUTS.get(method_name, HTTP_READ_TIMEOUT)
+
+    def send(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        """Отправитель запросов для apihelper.CUSTOM_REQUEST_SENDER"""
+        method_name = url.rsplit('/', 1)[-1]
+        self.requests += 1
+        try:
+            return self.session.request(
+                method, url, params=params, files=files,
+                timeout=self.get_timeout(method_name, timeout), proxies=proxies
+            )
+        except requests.exceptions.Timeout:
+            self.timeouts += 1
+            raise
+
+    def stats(self) -> Dict:
+        """Статистика переиспользования соединений по данным пулов urllib3"""
+        connections = 0
+        pool_requests = 0
+        pools = 0
+        if self.adapter is not None:
+            pool_manager = self.adapter.poolmanager
+            for key in list(pool_manager.pools.keys()):
+                pool = pool_manager.pools.get(key)
+                if pool is None:
+                    continue
+                pools += 1
+                connections += pool.num_connections
+                pool_requests += pool.num_requests
+        
+        return {
+            'requests': self.requests,
+            'timeouts': self.timeouts,
+            'pools': pools,
+            'connections_opened': connections,
+            'pool_requests': pool_requests,
+            'reuse_ratio': round(1 - connections / pool_requests, 4) if pool_requests else 0.0
+        }
+
+# Глобальный экземпляр
+http_transport = HttpTransport()
\ No newline at end of file
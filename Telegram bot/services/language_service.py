@@ -1,12 +1,16 @@
-from typing import Optional
+import threading
+import time
+from typing import Optional, Dict, Tuple
 from database import db
-from locales import ru, en
+from locales import LANGUAGES, DEFAULT_LANGUAGE, TEMPLATES
 import logging
 
 logger = logging.getLogger(__name__)
 
 class LanguageService:
     _instance = None
+    # Как часто повторять предупреждение об одном и том же отсутствующем ключе
+    MISSING_KEY_WARNING_INTERVAL = 300  # секунд
     
     def __new__(cls):
         if cls._instance is None:
@@ -18,10 +22,13 @@ class LanguageService:
         if self._initialized:
             return
         self._initialized = True
-        self.languages = {
-            'ru': ru.TRANSLATIONS,
-            'en': en.TRANSLATIONS
-        }
+        self.languages = LANGUAGES
+        self._missing_warned: Dict[Tuple[str, str], float] = {}
+        # Кэш языков чатов: chat_id -> язык (таблица создается миграциями БД)
+        self._chat_languages: Dict[int, str] = {}
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
         logger.info("✅ LanguageService инициализирован")
         logger.info(f"📚 Доступные языки: {', '.join(self.languages.keys())}")
     
@@ -29,56 +36,73 @@ class LanguageService:
         """Получает текст на нужном языке с подстановкой переменных"""
         try:
             lang = self.get_chat_language(chat_id)
-            translations = self.languages.get(lang, self.languages['ru'])
-            
-            # Получаем текст или ключ если нет перевода
-            text = translations.get(key)
-            if text is None:
-                logger.warning(f"⚠️ Отсутствует перевод для ключа '{key}' на языке {lang}")
-                text = key
-            
-            # Подставляем переменные
-            if kwargs and text != key:
-                try:
-                    text = text.format(**kwargs)
-                except KeyError as e:
-                    logger.error(f"❌ Отсутствует ключ в переводе '{key}': {e}")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка форматирования текста '{key}': {e}")
-            
-            return text
         except Exception as e:
             logger.error(f"❌ Ошибка в get_text для ключа '{key}': {e}")
             return key
+        return self.get_text_for_lang(lang, key, **kwargs)
+    
+    def get_text_for_lang(self, lang: str, key: str, **kwargs) -> str:
+        """Получает текст на уже известном языке, без запроса языка чата"""
+        if lang not in self.languages:
+            lang = DEFAULT_LANGUAGE
+        
+        # Получаем шаблон или ключ если нет перевода
+        template = TEMPLATES.get((lang, key))
+        if template is None:
+            self._warn_missing(lang, key)
+            return key
+        
+        if not kwargs:
+            return template.text
+        
+        # Подставляем переменные
+        missing = template.missing_fields(kwargs)
+        if missing:
+            logger.error(f"❌ Отсутствует ключ в переводе '{key}': {', '.join(sorted(missing))}")
+            return template.text
+        try:
+            return template.render(kwargs)
+        except Exception as e:
+            logger.error(f"❌ Ошибка форматирования текста '{key}': {e}")
+            return template.text
+    
+    def _warn_missing(self, lang: str, key: str):
+        """Предупреждает об отсутствующем переводе не чаще раза в интервал"""
+        now = time.monotonic()
+        last = self._missing_warned.get((lang, key))
+        if last is not None and now - last < self.MISSING_KEY_WARNING_INTERVAL:
+            return
+        self._missing_warned[(lang, key)] = now
+        logger.warning(f"⚠️ Отсутствует перевод для ключа '{key}' на языке {lang}")
     
     def get_chat_language(self, chat_id: int) -> str:
         """Получает язык чата"""
+        language = self._chat_languages.get(chat_id)
+        if language is not None:
+            self.hits += 1
+            return language
+        
+        self.misses += 1
         try:
             with db.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Убеждаемся что таблица существует
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS chat_languages (
-                        chat_id INTEGER PRIMARY KEY,
-                        language TEXT DEFAULT 'ru'
-                    )
-                ''')
-                
                 cursor.execute('''
                     SELECT language FROM chat_languages WHERE chat_id = ?
                 ''', (chat_id,))
                 result = cursor.fetchone()
-                
-                if result:
-                    return result['language']
-                
-                # По умолчанию русский
-                self.set_chat_language(chat_id, 'ru')
-                return 'ru'
         except Exception as e:
             logger.error(f"❌ Ошибка получения языка для чата {chat_id}: {e}")
             return 'ru'
+        
+        if result:
+            with self._cache_lock:
+                self._chat_languages[chat_id] = result['language']
+            return result['language']
+        
+        # По умолчанию русский; запись идет уже после блока чтения,
+        # чтобы кэш не заполнялся до фиксации транзакции
+        self.set_chat_language(chat_id, 'ru')
+        return 'ru'
     
     def set_chat_language(self, chat_id: int, language: str) -> bool:
         """Устанавливает язык для чата"""
@@ -89,22 +113,17 @@ class LanguageService:
             
             with db.get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Убеждаемся что таблица существует
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS chat_languages (
-                        chat_id INTEGER PRIMARY KEY,
-                        language TEXT DEFAULT 'ru'
-                    )
-                ''')
-                
                 cursor.execute('''
                     INSERT OR REPLACE INTO chat_languages (chat_id, language)
                     VALUES (?, ?)
                 ''', (chat_id, language))
-                
-                logger.info(f"✅ Язык для чата {chat_id} установлен на {language}")
-                return True
+            
+            # Обновляем кэш только после успешной записи
+            with self._cache_lock:
+                self._chat_languages[chat_id] = language
+            
+            logger.info(f"✅ Язык для чата {chat_id} установлен на {language}")
+            return True
                 
         except Exception as e:
             logger.error(f"❌ Ошибка установки языка для чата {chat_id}: {e}")
@@ -0,0 +1,101 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional
+from config import (
+    MEMBERSHIP_CACHE_POSITIVE_TTL,
+    MEMBERSHIP_CACHE_NEGATIVE_TTL,
+    MEMBERSHIP_CACHE_MAX_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+class MembershipCache:
+    """
+    LRU-кэш результатов проверки подписки с раздельным TTL
+    для положительных и отрицательных ответов
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.positive_ttl = MEMBERSHIP_CACHE_POSITIVE_TTL
+        self.negative_ttl = MEMBERSHIP_CACHE_NEGATIVE_TTL
+        self.max_size = MEMBERSHIP_CACHE_MAX_SIZE
+        self._entries = OrderedDict()
+        self._entries_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(channel, user_id: int) -> tuple:
+        return str(channel).lower(), user_id
+
+    def get(self, channel, user_id: int) -> Optional[bool]:
+        """Возвращает сохраненный результат или None, если записи нет или она устарела"""
+        key = self._key(channel, user_id)
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            is_member, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return is_member
+
+    def set(self, channel, user_id: int, is_member: bool):
+        """Сохраняет результат проверки подписки"""
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        if ttl <= 0:
+            return
+
+        key = self._key(channel, user_id)
+        with self._entries_lock:
+            self._entries[key] = (is_member, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+
+            # Вытесняем самые старые записи
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, channel, user_id: int):
+        """Удаляет запись для пары (канал, пользователь)"""
+        with self._entries_lock:
+            self._entries.pop(self._key(channel, user_id), None)
+
+    def invalidate_chat_member(self, chat, user_id: int):
+        """Сбрасывает кэш по обновлению chat_member (канал может быть записан по ID или @username)"""
+        self.invalidate(chat.id, user_id)
+        if chat.username:
+            self.invalidate(f"@{chat.username}", user_id)
+        logger.debug(f"Кэш подписки сброшен для {user_id} в {chat.id}")
+
+    def clear(self):
+        """Очищает кэш"""
+        with self._entries_lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# Глобальный экземпляр
+membership_cache = MembershipCache()
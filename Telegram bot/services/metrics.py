@@ -0,0 +1,318 @@
+import bisect
+import threading
+import time
+import logging
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+from telebot import TeleBot, apihelper
+from telebot.apihelper import ApiTelegramException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Списки обработчиков telebot, которые оборачиваются для метрик
+HANDLER_LISTS = (
+    'message_handlers',
+    'edited_message_handlers',
+    'callback_query_handlers',
+    'chat_member_handlers',
+    'my_chat_member_handlers'
+)
+
+def handler_name(func: Callable) -> str:
+    """
+    Имя обработчика для меток: модуль и qualname без <locals>
+    (обработчики объявлены внутри register_handlers, а __name__ повторяются в разных модулях)
+    """
+    return f"{func.__module__}.{func.__qualname__.replace('<locals>.', '')}"
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labelnames: tuple, labels: tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+class _ShardedMetric:
+    """
+    Метрика с отдельным словарем значений на каждый поток.
+    Запись идет без блокировок, шарды суммируются только при выгрузке
+    """
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _snapshots(self):
+        with self._shards_lock:
+            shards = list(self._shards)
+        # list(dict.items()) выполняется целиком под GIL
+        return [list(shard.items()) for shard in shards]
+
+class Counter(_ShardedMetric):
+    kind = 'counter'
+
+    def inc(self, labels: tuple = (), value: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + value
+
+    def collect(self) -> Dict[tuple, float]:
+        totals = {}
+        for items in self._snapshots():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self) -> list:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+            for labels, value in sorted(self.collect().items())
+        ]
+
+class Histogram(_ShardedMetric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: tuple = ()):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # [счетчики по корзинам (последняя - +Inf), сумма, количество]
+            entry = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def collect(self) -> Dict[tuple, list]:
+        totals = {}
+        for items in self._snapshots():
+            for labels, (counts, total, count) in items:
+                merged = totals.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                for i, bucket_count in enumerate(counts):
+                    merged[0][i] += bucket_count
+                merged[1] += total
+                merged[2] += count
+        return totals
+
+    def render(self) -> list:
+        lines = []
+        for labels, (counts, total, count) in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {round(total, 6)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+class Gauge:
+    """Значение, вычисляемое при выгрузке: число или словарь {метки: число}"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, func: Callable, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.labelnames = labelnames
+
+    def render(self) -> list:
+        try:
+            value = self.func()
+        except Exception as e:
+            logger.error(f"Ошибка вычисления метрики {self.name}: {e}")
+            return []
+        
+        if isinstance(value, dict):
+            return [
+                f'{self.name}{_format_labels(self.labelnames, labels)} {item}'
+                for labels, item in sorted(value.items())
+            ]
+        return [f'{self.name} {value}']
+
+class MetricsRegistry:
+    """Реестр метрик с выгрузкой в текстовом формате Prometheus"""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._metrics = {}
+        self._make_request = None
+        self._bot: Optional[TeleBot] = None
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str, func: Callable, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, func, labelnames))
+
+    def render(self) -> str:
+        """Текст для эндпоинта /metrics"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def install(self, bot: TeleBot):
+        """Подключает сбор метрик: обработчики, Bot API, БД и состояние сервисов"""
+        if self._bot is not None:
+            return
+        
+        self._bot = bot
+        self.instrument_handlers(bot)
+        self._install_api()
+        self._install_db()
+        self._register_service_gauges()
+        logger.info("Сбор метрик подключен")
+
+    def instrument_handlers(self, bot: TeleBot):
+        """Оборачивает функции всех зарегистрированных обработчиков"""
+        for list_name in HANDLER_LISTS:
+            for handler in getattr(bot, list_name, []):
+                handler['function'] = self.wrap_handler(handler['function'])
+
+    def wrap_handler(self, func: Callable) -> Callable:
+        name = handler_name(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                handler_errors.inc((name,))
+                raise
+            finally:
+                handler_updates.inc((name,))
+                handler_seconds.observe(time.perf_counter() - started, (name,))
+        return wrapper
+
+    def _install_api(self):
+        # Внешний слой поверх outbound и api_retry: время с учетом ожидания и повторов
+        self._make_request = apihelper._make_request
+        apihelper._make_request = self._request
+
+    def _request(self, token, method_name, method='get', params=None, files=None):
+        started = time.perf_counter()
+        try:
+            return self._make_request(token, method_name, method=method, params=params, files=files)
+        except Exception as e:
+            code = e.error_code if isinstance(e, ApiTelegramException) else type(e).__name__
+            api_errors.inc((method_name, code))
+            raise
+        finally:
+            api_requests.inc((method_name,))
+            api_seconds.observe(time.perf_counter() - started, (method_name,))
+
+    def _install_db(self):
+        # Импорт здесь: database не должен зависеть от services
+        from database import db
+        db.add_query_observer(self._observe_query)
+
+    @staticmethod
+    def _observe_query(sql: str, elapsed: float):
+        kind = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else 'OTHER'
+        db_queries.inc((kind,))
+        db_seconds.observe(elapsed, (kind,))
+
+    def _register_service_gauges(self):
+        from services.membership_cache import membership_cache
+        from services.group_policy import group_policies
+        from services.language_service import language_service
+        from services.admin_cache import admin_cache
+        from services.scheduler import scheduler
+        from services.auto_delete import auto_delete_queue
+        from services.dispatcher import dispatcher
+        from services.outbound import outbound
+        
+        caches = {
+            'membership': membership_cache,
+            'group_policy': group_policies,
+            'language': language_service,
+            'admin': admin_cache
+        }
+
+        def hit_ratios() -> Dict[Tuple[str], float]:
+            ratios = {}
+            for name, cache in caches.items():
+                total = cache.hits + cache.misses
+                ratios[(name,)] = round(cache.hits / total, 4) if total else 0.0
+            return ratios
+        
+        self.gauge('bot_cache_hit_ratio', 'Доля попаданий в кэш', hit_ratios, ('cache',))
+        self.gauge('bot_scheduler_lag_seconds', 'Опоздание последней обработки планировщика',
+                   lambda: scheduler.last_lag)
+        self.gauge('bot_auto_delete_pending', 'Сообщения в очереди автоудаления',
+                   auto_delete_queue.pending_count)
+        self.gauge('bot_dispatcher_lane_depth', 'Обновления в очереди линии диспетчера',
+                   lambda: {(lane.index,): lane.queue.qsize() for lane in dispatcher.lanes}, ('lane',))
+        self.gauge('bot_outbound_waiting', 'Запросы, ожидающие токен шлюза',
+                   lambda: outbound.stats()['waiting'])
+        self.gauge('bot_db_statement_seconds', 'Суммарное время самых затратных запросов к БД',
+                   self._top_statements, ('statement',))
+
+    @staticmethod
+    def _top_statements() -> Dict[Tuple[str], float]:
+        from database import db
+        return {
+            (item['statement'],): round(item['total_ms'] / 1000, 6)
+            for item in db.get_statement_stats(limit=10)
+        }
+
+# Глобальный экземпляр
+metrics = MetricsRegistry()
+
+handler_updates = metrics.counter('bot_handler_updates_total', 'Обработанные обновления по обработчикам', ('handler',))
+handler_errors = metrics.counter('bot_handler_errors_total', 'Ошибки обработчиков', ('handler',))
+handler_seconds = metrics.histogram('bot_handler_seconds', 'Время работы обработчика', ('handler',))
+api_requests = metrics.counter('bot_api_requests_total', 'Запросы к Bot API по методам', ('method',))
+api_errors = metrics.counter('bot_api_errors_total', 'Ошибки Bot API по методам и кодам', ('method', 'code'))
+api_seconds = metrics.histogram('bot_api_request_seconds', 'Время запроса к Bot API', ('method',))
+db_queries = metrics.counter('bot_db_queries_total', 'Запросы к БД по типу', ('statement',))
+db_seconds = metrics.histogram('bot_db_query_seconds', 'Время запроса к БД', ('statement',),
+                               buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1))
\ No newline at end of file
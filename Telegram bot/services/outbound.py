@@ -0,0 +1,242 @@
+import heapq
+import itertools
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional, Dict
+from telebot import apihelper
+from config import (
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_GROUP_PER_MINUTE,
+    OUTBOUND_PRIVATE_RATE,
+    OUTBOUND_LOW_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: меньше - важнее
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Методы, которые публикуют сообщения в чат и попадают под лимит чата
+CHAT_LIMITED_PREFIXES = ('send', 'forward', 'copy')
+
+class OutboundDropped(Exception):
+    """Запрос низкого приоритета не дождался своей очереди и был отброшен"""
+    pass
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд появится токен (0 - уже есть)"""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class OutboundGateway:
+    """
+    Единая точка исходящих запросов к Bot API.
+    Глобальная корзина ограничивает все изменяющие запросы бота,
+    корзины чатов - отправку сообщений в конкретный чат.
+    Ожидающие запросы обслуживаются по приоритету (владелец и размут раньше предупреждений)
+    """
+    _instance = None
+    _lock = threading.Lock()
+    # Порог числа корзин чатов, после которого удаляются полные (неактивные)
+    MAX_CHAT_BUCKETS = 10000
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._condition = threading.Condition()
+        self._global = TokenBucket(OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_RATE)
+        self._chats: Dict[str, TokenBucket] = {}
+        # Куча ожидающих: (приоритет, номер, ключ чата или None)
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._local = threading.local()
+        self._make_request = None
+        self.throttled = 0
+        self.dropped = 0
+
+    def install(self):
+        """Подключает шлюз ко всем запросам telebot через apihelper._make_request"""
+        if self._make_request is not None:
+            return
+        
+        self._make_request = apihelper._make_request
+        apihelper._make_request = self._request
+        logger.info("Шлюз исходящих запросов подключен")
+
+    @contextmanager
+    def priority(self, level: int, timeout: Optional[float] = None):
+        """Задает приоритет (и предельное ожидание) запросов текущего потока"""
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = (level, timeout)
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    @staticmethod
+    def chat_key_for(method_name: str, params: Optional[dict]) -> Optional[str]:
+        """Ключ корзины чата для запроса или None, если действует только глобальная корзина"""
+        if params and 'chat_id' in params and method_name.startswith(CHAT_LIMITED_PREFIXES):
+            return str(params['chat_id'])
+        return None
+
+    def _request(self, token, method_name, method='get', params=None, files=None):
+        if not method_name.startswith('get'):
+            level, timeout = getattr(self._local, 'priority', None) or (PRIORITY_NORMAL, None)
+            self.acquire(self.chat_key_for(method_name, params), level, timeout)
+        return self._make_request(token, method_name, method=method, params=params, files=files)
+
+    def penalize(self, chat_key: Optional[str], retry_after: float):
+        """
+        Учитывает ответ 429: корзина чата (или глобальная) не выдаст токен раньше retry_after
+        """
+        with self._condition:
+            now = time.monotonic()
+            bucket = self._chat_bucket(chat_key) if chat_key else self._global
+            bucket.refill(now)
+            bucket.tokens = min(bucket.tokens, 1 - retry_after * bucket.rate)
+            self._condition.notify_all()
+        logger.warning(f"Flood limit для {chat_key or 'бота'}: пауза {retry_after}с")
+
+    def _chat_bucket(self, chat_key: str) -> TokenBucket:
+        bucket = self._chats.get(chat_key)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_CHAT_BUCKETS:
+                self._prune_chat_buckets()
+            # Группы и каналы имеют отрицательный ID или @username
+            if chat_key.startswith(('-', '@')):
+                rate = OUTBOUND_GROUP_PER_MINUTE / 60
+                bucket = TokenBucket(rate, OUTBOUND_GROUP_PER_MINUTE)
+            else:
+                bucket = TokenBucket(OUTBOUND_PRIVATE_RATE, OUTBOUND_PRIVATE_RATE)
+            self._chats[chat_key] = bucket
+        return bucket
+
+    def _prune_chat_buckets(self):
+        now = time.monotonic()
+        waiting = {chat_key for _, _, chat_key in self._waiters}
+        for chat_key, bucket in list(self._chats.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity and chat_key not in waiting:
+                del self._chats[chat_key]
+
+    def acquire(self, chat_key: Optional[str], level: int = PRIORITY_NORMAL,
+                timeout: Optional[float] = None):
+        """
+        Ждет токен глобальной корзины (и корзины чата, если chat_key задан).
+        Бросает OutboundDropped, если timeout истек раньше. Запрос с timeout
+        не ждет корзину чата: если в ней нет токена, он отбрасывается сразу
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        
+        with self._condition:
+            ticket = (level, next(self._sequence), chat_key)
+            heapq.heappush(self._waiters, ticket)
+            waited = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    chat_bucket = self._chat_bucket(chat_key) if chat_key else None
+                    wait = self._global.wait_time(now)
+                    if chat_bucket is not None:
+                        chat_wait = chat_bucket.wait_time(now)
+                        # Ожидание лимита чата (до 20 в минуту) заняло бы линию диспетчера на секунды
+                        if chat_wait > 0 and deadline is not None:
+                            self.dropped += 1
+                            raise OutboundDropped(f"Исчерпан лимит отправки в {chat_key}")
+                        wait = max(wait, chat_wait)
+                    
+                    if wait == 0 and not self._has_ready_waiter_before(ticket, now):
+                        self._global.tokens -= 1
+                        if chat_bucket is not None:
+                            chat_bucket.tokens -= 1
+                        if waited:
+                            self.throttled += 1
+                        return
+                    
+                    if wait == 0:
+                        # Токен есть, но его заберет более приоритетный запрос
+                        wait = 1 / self._global.rate
+                    
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self.dropped += 1
+                            raise OutboundDropped(f"Превышено время ожидания отправки в {chat_key}")
+                        wait = min(wait, remaining)
+                    
+                    waited = True
+                    self._condition.wait(timeout=wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def _has_ready_waiter_before(self, ticket: tuple, now: float) -> bool:
+        """Есть ли более ранний в очереди запрос, которому уже хватает токена своего чата"""
+        for other in self._waiters:
+            if other >= ticket:
+                continue
+            other_chat = other[2]
+            if other_chat is None or self._chat_bucket(other_chat).wait_time(now) == 0:
+                return True
+        return False
+
+    def stats(self) -> Dict:
+        """Состояние шлюза для мониторинга"""
+        return {
+            'waiting': len(self._waiters),
+            'chat_buckets': len(self._chats),
+            'throttled': self.throttled,
+            'dropped': self.dropped
+        }
+
+# Глобальный экземпляр
+outbound = OutboundGateway()
+
+def with_priority(level: int, timeout: Optional[float] = None):
+    """Декоратор: все запросы к Bot API внутри функции идут с заданным приоритетом"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with outbound.priority(level, timeout):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def low_priority():
+    """
+    Приоритет для предупреждений: отбрасываются сразу при исчерпанном лимите чата
+    и если ждут глобальную корзину дольше OUTBOUND_LOW_TIMEOUT
+    """
+    return outbound.priority(PRIORITY_LOW, OUTBOUND_LOW_TIMEOUT)
\ No newline at end of file
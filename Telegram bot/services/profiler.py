@@ -0,0 +1,183 @@
+import json
+import random
+import threading
+import time
+import logging
+from functools import wraps
+from typing import Callable, Optional
+from telebot import TeleBot, apihelper
+from config import SLOW_UPDATE_THRESHOLD_MS, SLOW_LOG_SAMPLE_RATE
+from database import db
+from services.metrics import HANDLER_LISTS, handler_name
+
+logger = logging.getLogger(__name__)
+# Отдельный логгер, чтобы медленные обновления можно было направить в свой файл
+slow_logger = logging.getLogger('slow_updates')
+
+class _UpdateTimes:
+    """Накопитель времени одного обновления (пишут поток обработчика и задачи пула)"""
+    __slots__ = ('api_time', 'api_calls', 'db_time', 'db_queries', 'task_cpu', 'lock')
+
+    def __init__(self):
+        self.api_time = self.db_time = self.task_cpu = 0.0
+        self.api_calls = self.db_queries = 0
+        self.lock = threading.Lock()
+
+class HandlerProfiler:
+    """
+    Замеряет время обработчиков и раскладывает его на Bot API, БД и CPU.
+    Разбивка собирается только для выборки обновлений (SLOW_LOG_SAMPLE_RATE),
+    для остальных замеряется только общее время.
+    Обновления дольше SLOW_UPDATE_THRESHOLD_MS пишутся в журнал slow_updates в виде JSON.
+    Задачи, отправленные обработчиком в пулы потоков через bind(), учитываются в его обновлении
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.threshold = SLOW_UPDATE_THRESHOLD_MS / 1000
+        self.sample_rate = SLOW_LOG_SAMPLE_RATE
+        # Накопитель текущего обновления (_UpdateTimes) в потоке обработчика или задачи
+        self._local = threading.local()
+        self._make_request = None
+        self.slow_updates = 0
+
+    def install(self, bot: TeleBot):
+        """Оборачивает обработчики и подключает учет времени Bot API и БД"""
+        if self._make_request is not None:
+            return
+        
+        for list_name in HANDLER_LISTS:
+            update_type = list_name[:-len('_handlers')]
+            for handler in getattr(bot, list_name, []):
+                handler['function'] = self.wrap_handler(handler['function'], update_type)
+        
+        self._make_request = apihelper._make_request
+        apihelper._make_request = self._request
+        db.add_query_observer(self._observe_query)
+        logger.info(f"Журнал медленных обновлений: порог {SLOW_UPDATE_THRESHOLD_MS} мс, "
+                    f"выборка {self.sample_rate:.0%}")
+
+    def bind(self, func: Callable) -> Callable:
+        """
+        Привязывает func к обновлению текущего потока: время Bot API, БД и CPU,
+        потраченное func в другом потоке (пул проверок подписки), учитывается в нем
+        """
+        times = getattr(self._local, 'times', None)
+        if times is None:
+            return func
+        
+        @wraps(func)
+        def task(*args, **kwargs):
+            local = self._local
+            previous = getattr(local, 'times', None)
+            local.times = times
+            cpu_started = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                local.times = previous
+                with times.lock:
+                    times.task_cpu += time.thread_time() - cpu_started
+        return task
+
+    def _request(self, token, method_name, method='get', params=None, files=None):
+        times = getattr(self._local, 'times', None)
+        if times is None:
+            return self._make_request(token, method_name, method=method, params=params, files=files)
+        
+        started = time.perf_counter()
+        try:
+            return self._make_request(token, method_name, method=method, params=params, files=files)
+        finally:
+            elapsed = time.perf_counter() - started
+            with times.lock:
+                times.api_time += elapsed
+                times.api_calls += 1
+
+    def _observe_query(self, sql: str, elapsed: float):
+        times = getattr(self._local, 'times', None)
+        if times is not None:
+            with times.lock:
+                times.db_time += elapsed
+                times.db_queries += 1
+
+    @staticmethod
+    def get_chat_id(event) -> Optional[int]:
+        chat = getattr(event, 'chat', None)
+        if chat is None:
+            message = getattr(event, 'message', None)
+            chat = getattr(message, 'chat', None)
+        return chat.id if chat is not None else None
+
+    def wrap_handler(self, func: Callable, update_type: str) -> Callable:
+        name = handler_name(func)
+        
+        @wraps(func)
+        def wrapper(event, *args, **kwargs):
+            local = self._local
+            # Вложенный вызов обработчика учитывается во внешнем
+            if getattr(local, 'times', None) is not None:
+                return func(event, *args, **kwargs)
+            
+            sampled = random.random() < self.sample_rate
+            if sampled:
+                times = local.times = _UpdateTimes()
+                cpu_started = time.thread_time()
+            started = time.perf_counter()
+            try:
+                return func(event, *args, **kwargs)
+            finally:
+                wall = time.perf_counter() - started
+                breakdown = None
+                if sampled:
+                    local.times = None
+                    breakdown = self._breakdown(times, wall, time.thread_time() - cpu_started)
+                if wall >= self.threshold:
+                    self._log_slow(name, update_type, event, wall, breakdown)
+        return wrapper
+
+    @staticmethod
+    def _breakdown(times: _UpdateTimes, wall: float, cpu: float) -> dict:
+        with times.lock:
+            api_time, api_calls = times.api_time, times.api_calls
+            db_time, db_queries = times.db_time, times.db_queries
+            cpu += times.task_cpu
+        # Время CPU потоков включает работу SQLite, поэтому вычитаем время БД.
+        # Параллельные задачи суммируются, поэтому сумма частей может превысить wall
+        cpu_outside_db = max(0.0, cpu - db_time)
+        other = max(0.0, wall - api_time - db_time - cpu_outside_db)
+        return {
+            'api_ms': round(api_time * 1000, 1),
+            'api_calls': api_calls,
+            'db_ms': round(db_time * 1000, 1),
+            'db_queries': db_queries,
+            'cpu_ms': round(cpu_outside_db * 1000, 1),
+            'other_ms': round(other * 1000, 1)
+        }
+
+    def _log_slow(self, handler: str, update_type: str, event, wall: float, breakdown: Optional[dict]):
+        self.slow_updates += 1
+        record = {
+            'event': 'slow_update',
+            'handler': handler,
+            'update_type': update_type,
+            'chat_id': self.get_chat_id(event),
+            'wall_ms': round(wall * 1000, 1),
+            'breakdown': breakdown
+        }
+        slow_logger.warning(json.dumps(record, ensure_ascii=False))
+
+# Глобальный экземпляр
+profiler = HandlerProfiler()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import threading
+import logging
+from typing import Optional
+from telebot import TeleBot
+from telebot.types import User
+
+logger = logging.getLogger(__name__)
+
+class BotRuntime:
+    """
+    Общий контекст запущенного бота.
+    Данные о самом боте (get_me) запрашиваются один раз и переиспользуются всеми обработчиками
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.bot: Optional[TeleBot] = None
+        self._me: Optional[User] = None
+        self._me_lock = threading.Lock()
+
+    def init(self, bot: TeleBot) -> User:
+        """Запоминает бота и запрашивает его данные (ошибки API пробрасываются)"""
+        self.bot = bot
+        with self._me_lock:
+            self._me = bot.get_me()
+        # TeleBot.user кэширует get_me в _user; без этого polling() запросит его еще раз
+        bot._user = self._me
+        logger.debug(f"Данные бота получены: @{self._me.username}")
+        return self._me
+
+    @property
+    def me(self) -> User:
+        """Данные бота; если init() не вызывался, запрашиваются при первом обращении"""
+        if self._me is None:
+            with self._me_lock:
+                if self._me is None:
+                    self._me = self.bot.get_me()
+        return self._me
+
+    @property
+    def bot_id(self) -> int:
+        return self.me.id
+
+    @property
+    def bot_username(self) -> str:
+        return self.me.username
+
+# Глобальный экземпляр
+runtime = BotRuntime()
\ No newline at end of file
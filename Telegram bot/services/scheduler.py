@@ -1,17 +1,27 @@
+import heapq
 import threading
 import time
 import logging
 from datetime import datetime
 from typing import Optional
 from telebot import TeleBot
+from telebot.types import ChatPermissions
 from database import db
 from config import OWNER_ID
+from services.group_policy import group_policies
+from services.vip_index import vip_index
+from services.outbound import with_priority, PRIORITY_HIGH
+from utils.time_parser import parse_db_timestamp
 
 logger = logging.getLogger(__name__)
 
 class Scheduler:
     _instance = None
     _lock = threading.Lock()
+    # Страховочная пересверка БД, если срок был записан в обход notify()
+    FALLBACK_INTERVAL = 3600  # секунд
+    # Пауза перед повтором, если проверка сроков завершилась ошибкой
+    RETRY_DELAY = 5  # секунд
     
     def __new__(cls):
         if cls._instance is None:
@@ -28,6 +38,12 @@ class Scheduler:
         self.bot: Optional[TeleBot] = None
         self.running = False
         self.thread: Optional[threading.Thread] = None
+        # Куча ближайших сроков истечения (datetime) и те же сроки множеством, без повторов
+        self._deadlines = []
+        self._pending = set()
+        self._condition = threading.Condition()
+        # Опоздание последней обработки относительно срока, секунд
+        self.last_lag = 0.0
     
     def set_bot(self, bot: TeleBot):
         """Устанавливает экземпляр бота"""
@@ -41,27 +57,106 @@ class Scheduler:
             return
         
         self.running = True
+        self._load_deadlines()
         self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.thread.start()
         logger.info("Планировщик задач запущен")
     
     def stop(self):
         """Останавливает планировщик"""
-        self.running = False
+        with self._condition:
+            self.running = False
+            self._condition.notify()
         logger.info("Планировщик задач остановлен")
     
+    def notify(self, deadline: Optional[datetime]):
+        """
+        Сообщает планировщику о новом сроке истечения (канал, VIP или мут).
+        Вызывать после записи срока в БД
+        """
+        if deadline is None:
+            return
+        
+        with self._condition:
+            # После каждого прохода _load_deadlines снова сообщает еще не наступившие сроки
+            if deadline in self._pending:
+                return
+            self._pending.add(deadline)
+            heapq.heappush(self._deadlines, deadline)
+            # Будим поток, только если срок стал ближайшим
+            if self._deadlines[0] == deadline:
+                self._condition.notify()
+    
+    def _load_deadlines(self):
+        """Загружает из БД ближайший срок по каждой таблице"""
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT MIN(check_until) FROM channels
+                WHERE check_until IS NOT NULL AND is_active = 1
+            ''')
+            channels_next = cursor.fetchone()[0]
+            cursor.execute('SELECT MIN(end_date) FROM vip_users WHERE end_date IS NOT NULL')
+            vip_next = cursor.fetchone()[0]
+            cursor.execute('SELECT MIN(mute_end) FROM muted_users')
+            mutes_next = cursor.fetchone()[0]
+        
+        for value in (channels_next, vip_next, mutes_next):
+            self.notify(parse_db_timestamp(value))
+    
     def _run_scheduler(self):
-        """Основной цикл планировщика"""
-        while self.running:
+        """Основной цикл планировщика: спит до ближайшего срока"""
+        while True:
+            with self._condition:
+                if not self.running:
+                    return
+                
+                timeout = self.FALLBACK_INTERVAL
+                if self._deadlines:
+                    timeout = min(timeout, (self._deadlines[0] - datetime.now()).total_seconds())
+                notified = False
+                if timeout > 0:
+                    notified = self._condition.wait(timeout=timeout)
+                
+                if not self.running:
+                    return
+                
+                # Снимаем все наступившие сроки
+                now = datetime.now()
+                earliest = None
+                while self._deadlines and self._deadlines[0] <= now:
+                    deadline = heapq.heappop(self._deadlines)
+                    self._pending.discard(deadline)
+                    earliest = earliest or deadline
+                
+                if earliest is None and notified:
+                    # Разбудили новым сроком, который еще не наступил
+                    continue
+            
+            if earliest is not None:
+                self.last_lag = (now - earliest).total_seconds()
+            
+            # Проверки независимы: ошибка одной (например, database is locked) не отменяет остальные
+            failed = False
+            for check in (self._check_expired_channels, self._check_expired_vip, self._check_expired_mutes):
+                try:
+                    check()
+                except Exception as e:
+                    failed = True
+                    logger.error(f"Ошибка в планировщике ({check.__name__}): {e}")
+            
+            if failed:
+                # Просроченный срок вернется в кучу, пауза не дает повторять проверку без остановки
+                with self._condition:
+                    if self.running:
+                        self._condition.wait(timeout=self.RETRY_DELAY)
+            
+            # Наступившие сроки уже сняты с кучи, поэтому она всегда перестраивается из БД:
+            # иначе необработанные сроки ждали бы FALLBACK_INTERVAL
             try:
-                self._check_expired_channels()
-                self._check_expired_vip()
-                self._check_expired_mutes()
+                self._load_deadlines()
             except Exception as e:
-                logger.error(f"Ошибка в планировщике: {e}")
-            
-            # Проверяем каждую минуту
-            time.sleep(60)
+                logger.error(f"Ошибка загрузки сроков планировщика: {e}")
     
     def _check_expired_channels(self):
         """Проверяет истекшие каналы"""
@@ -75,7 +170,7 @@ class Scheduler:
             
             # Находим каналы с истекшим сроком проверки
             cursor.execute('''
-                SELECT c.*, g.group_title 
+                SELECT c.id, c.group_id, c.channel_username, c.check_until, g.group_title 
                 FROM channels c
                 JOIN groups g ON c.group_id = g.group_id
                 WHERE c.check_until IS NOT NULL 
@@ -84,35 +179,34 @@ class Scheduler:
             ''', (now,))
             
             expired = cursor.fetchall()
+            if not expired:
+                return
             
             for channel in expired:
                 try:
-                    # Получаем данные по индексам
-                    channel_id = channel[0]
-                    channel_username = channel[2]
-                    check_until = channel[5]
-                    group_title = channel[7]
-                    
                     # Отправляем уведомление владельцу
                     self.bot.send_message(
                         OWNER_ID,
                         f"⏰ **Канал снят с проверки**\n\n"
-                        f"📢 Канал: {channel_username}\n"
-                        f"👥 Группа: {group_title}\n"
-                        f"📅 Время окончания: {check_until}",
+                        f"📢 Канал: {channel['channel_username']}\n"
+                        f"👥 Группа: {channel['group_title']}\n"
+                        f"📅 Время окончания: {channel['check_until']}",
                         parse_mode="Markdown"
                     )
                     
-                    # Деактивируем канал
-                    cursor.execute('''
-                        UPDATE channels SET is_active = 0 
-                        WHERE id = ?
-                    ''', (channel_id,))
-                    
-                    logger.info(f"Канал {channel_username} снят с проверки (истек срок)")
+                    logger.info(f"Канал {channel['channel_username']} снят с проверки (истек срок)")
                     
                 except Exception as e:
                     logger.error(f"Ошибка при обработке истекшего канала: {e}")
+            
+            # Деактивируем все истекшие каналы одним запросом
+            cursor.executemany('''
+                UPDATE channels SET is_active = 0 
+                WHERE id = ?
+            ''', [(channel['id'],) for channel in expired])
+        
+        for group_id in {channel['group_id'] for channel in expired}:
+            group_policies.invalidate(group_id)
     
     def _check_expired_vip(self):
         """Проверяет истекшие VIP подписки"""
@@ -127,9 +221,13 @@ class Scheduler:
                 WHERE end_date IS NOT NULL AND end_date <= ?
             ''', (now,))
             
-            if cursor.rowcount > 0:
-                logger.info(f"Удалено {cursor.rowcount} истекших VIP подписок")
+            removed = cursor.rowcount
+        
+        if removed > 0:
+            vip_index.remove_expired(now)
+            logger.info(f"Удалено {removed} истекших VIP подписок")
     
+    @with_priority(PRIORITY_HIGH)
     def _check_expired_mutes(self):
         """Проверяет истекшие муты и размучивает пользователей"""
         if not self.bot:
@@ -142,31 +240,31 @@ class Scheduler:
             
             # Находим истекшие муты
             cursor.execute('''
-                SELECT * FROM muted_users 
+                SELECT user_id, group_id FROM muted_users 
                 WHERE mute_end <= ?
             ''', (now,))
             
             expired = cursor.fetchall()
+            if not expired:
+                return
+            
+            permissions = ChatPermissions(
+                can_send_messages=True,
+                can_send_media_messages=True,
+                can_send_polls=True,
+                can_send_other_messages=True,
+                can_add_web_page_previews=True,
+                can_change_info=True,
+                can_invite_users=True,
+                can_pin_messages=True
+            )
             
             for mute in expired:
                 try:
                     # Размучиваем пользователя
-                    from telebot.types import ChatPermissions
-                    
-                    permissions = ChatPermissions(
-                        can_send_messages=True,
-                        can_send_media_messages=True,
-                        can_send_polls=True,
-                        can_send_other_messages=True,
-                        can_add_web_page_previews=True,
-                        can_change_info=True,
-                        can_invite_users=True,
-                        can_pin_messages=True
-                    )
-                    
                     self.bot.restrict_chat_member(
-                        mute['group_id'],  # group_id
-                        mute['user_id'],  # user_id
+                        mute['group_id'],
+                        mute['user_id'],
                         permissions=permissions
                     )
                     
@@ -174,12 +272,12 @@ class Scheduler:
                     
                 except Exception as e:
                     logger.error(f"Не удалось размутить {mute['user_id']}: {e}")
-                
-                # Удаляем из таблицы мутов
-                cursor.execute('''
-                    DELETE FROM muted_users 
-                    WHERE user_id = ? AND group_id = ?
-                ''', (mute['user_id'], mute['group_id']))
+            
+            # Удаляем из таблицы мутов одним запросом
+            cursor.executemany('''
+                DELETE FROM muted_users 
+                WHERE user_id = ? AND group_id = ?
+            ''', [(mute['user_id'], mute['group_id']) for mute in expired])
 
 # Глобальный экземпляр планировщика
 scheduler = Scheduler()
\ No newline at end of file
@@ -1,45 +1,144 @@
-import threading
-import time
 import logging
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict
 from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from database import db
-from config import OWNER_ID
+from config import OWNER_ID, SUBSCRIPTION_CHECK_WORKERS
 from services.language_service import language_service
+from services.membership_cache import membership_cache
+from services.group_policy import group_policies
+from services.auto_delete import auto_delete_queue
+from services.vip_index import vip_index
+from services.admin_cache import admin_cache
+from services.outbound import OutboundDropped, low_priority
+from services.profiler import profiler
 
 logger = logging.getLogger(__name__)
 
+# Общий ограниченный пул для запросов get_chat_member по разным каналам
+_check_pool = ThreadPoolExecutor(
+    max_workers=SUBSCRIPTION_CHECK_WORKERS,
+    thread_name_prefix='subscription-check'
+)
+
 class SubscriptionChecker:
     def __init__(self, bot: TeleBot):
         self.bot = bot
 
-    def check_user_subscription(self, user_id: int, channels: list) -> bool:
+    def resolve_channel_id(self, channel: str) -> Optional[int]:
+        """
+        Получает числовой ID канала через API и сохраняет его в БД,
+        если он изменился (сбрасываются политики только затронутых групп)
+        """
+        try:
+            chat = self.bot.get_chat(channel)
+        except Exception as e:
+            logger.error(f"Ошибка получения канала {channel}: {e}")
+            return None
+        
+        channel_id = str(chat.id)
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT DISTINCT group_id FROM channels
+                WHERE channel_username = ? AND (channel_id IS NULL OR channel_id != ?)
+            ''', (channel, channel_id))
+            stale_groups = [row[0] for row in cursor.fetchall()]
+            
+            if stale_groups:
+                cursor.execute('''
+                    UPDATE channels SET channel_id = ?
+                    WHERE channel_username = ? AND (channel_id IS NULL OR channel_id != ?)
+                ''', (channel_id, channel, channel_id))
+        
+        # Канал может проверяться в нескольких группах
+        for group_id in stale_groups:
+            group_policies.invalidate(group_id)
+        
+        if stale_groups:
+            logger.info(f"ID канала {channel} обновлен: {chat.id}")
+        return chat.id
+
+    def _check_channel(self, user_id: int, channel: str, channel_id: Optional[int]) -> bool:
+        """
+        Проверяет подписку на один канал.
+        Если сохраненный ID устарел, обновляет его и повторяет запрос
+        """
+        resolved = channel_id is None
+        if resolved:
+            channel_id = self.resolve_channel_id(channel)
+            if channel_id is None:
+                # Канал недоступен - не наказываем пользователя
+                return True
+        
+        while True:
+            try:
+                member = self.bot.get_chat_member(channel_id, user_id)
+                break
+            except Exception as e:
+                # Повторы и flood wait уже отработаны в api_retry
+                if resolved or not (isinstance(e, ApiTelegramException) and e.error_code == 400):
+                    logger.error(f"Ошибка проверки подписки на {channel}, пропускаем проверку: {e}")
+                    # Если не можем проверить, не удаляем сообщение и не кэшируем результат
+                    return True
+                
+                # Сохраненный ID мог устареть - получаем его заново
+                logger.warning(f"Не удалось проверить {channel} по ID {channel_id}, обновляем ID: {e}")
+                resolved = True
+                previous_id = channel_id
+                channel_id = self.resolve_channel_id(channel)
+                if channel_id is None or channel_id == previous_id:
+                    # ID не изменился - повторный запрос получит ту же ошибку
+                    logger.error(f"Ошибка проверки подписки на {channel}, пропускаем проверку: {e}")
+                    return True
+        
+        is_member = member.status in ['member', 'administrator', 'creator']
+        membership_cache.set(channel, user_id, is_member)
+        if not is_member:
+            logger.debug(f"Пользователь {user_id} не подписан на {channel}")
+        return is_member
+
+    def check_user_subscription(self, user_id: int, channels: list,
+                                channel_ids: Optional[Dict[str, int]] = None) -> bool:
         """
         Проверяет подписку пользователя на каналы
         Возвращает True, если пользователь подписан на все каналы
+        channel_ids - сохраненные ID каналов, чтобы не вызывать get_chat
         """
         if not channels:
             return True
         
+        channel_ids = channel_ids or {}
+        pending = []
+        
         for channel in channels:
-            try:
-                # Получаем информацию о канале
-                chat = self.bot.get_chat(channel)
-                
-                # Проверяем статус пользователя в канале
-                try:
-                    member = self.bot.get_chat_member(chat.id, user_id)
-                    if member.status not in ['member', 'administrator', 'creator']:
-                        logger.debug(f"Пользователь {user_id} не подписан на {channel}")
-                        return False
-                except Exception as e:
-                    logger.error(f"Ошибка проверки подписки на {channel}: {e}")
-                    # Если не можем проверить, считаем что не подписан
-                    return False
-                    
-            except Exception as e:
-                logger.error(f"Ошибка получения канала {channel}: {e}")
+            # Сначала смотрим в кэш
+            cached = membership_cache.get(channel, user_id)
+            if cached is None:
+                pending.append(channel)
+            elif not cached:
+                logger.debug(f"Пользователь {user_id} не подписан на {channel} (кэш)")
+                return False
+        
+        if not pending:
+            return True
+        
+        if len(pending) == 1:
+            channel = pending[0]
+            return self._check_channel(user_id, channel, channel_ids.get(channel))
+        
+        # Проверяем каналы параллельно и выходим при первом отрицательном ответе
+        futures = [
+            # Время задач пула учитывается в обновлении, которое их запустило
+            _check_pool.submit(profiler.bind(self._check_channel), user_id, channel, channel_ids.get(channel))
+            for channel in pending
+        ]
+        for future in as_completed(futures):
+            if not future.result():
+                for other in futures:
+                    other.cancel()
                 return False
         
         return True
@@ -54,50 +153,36 @@ class SubscriptionChecker:
         
         # Проверяем, является ли пользователь администратором группы
         try:
-            member = self.bot.get_chat_member(group_id, user_id)
-            if member.status in ['administrator', 'creator']:
+            if admin_cache.is_admin(self.bot, group_id, user_id):
                 logger.debug(f"Пользователь {user_id} - администратор группы")
                 return True
         except Exception as e:
             logger.error(f"Ошибка проверки статуса администратора: {e}")
         
-        # Проверяем VIP статус
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Проверяем глобальный VIP
-            cursor.execute('''
-                SELECT * FROM vip_users 
-                WHERE user_id = ? AND scope = 'global'
-                AND (end_date IS NULL OR end_date > ?)
-            ''', (user_id, datetime.now()))
-            
-            if cursor.fetchone():
-                logger.debug(f"Пользователь {user_id} имеет глобальный VIP")
-                return True
-            
-            # Проверяем локальный VIP для этой группы
-            cursor.execute('''
-                SELECT * FROM vip_users 
-                WHERE user_id = ? AND group_id = ? AND scope = 'local'
-                AND (end_date IS NULL OR end_date > ?)
-            ''', (user_id, group_id, datetime.now()))
-            
-            if cursor.fetchone():
-                logger.debug(f"Пользователь {user_id} имеет локальный VIP в группе {group_id}")
-                return True
+        # Проверяем глобальный VIP
+        if vip_index.has_global_vip(user_id):
+            logger.debug(f"Пользователь {user_id} имеет глобальный VIP")
+            return True
+        
+        # Проверяем локальный VIP для этой группы
+        if vip_index.has_local_vip(user_id, group_id):
+            logger.debug(f"Пользователь {user_id} имеет локальный VIP в группе {group_id}")
+            return True
         
         return False
 
-    def create_subscription_keyboard(self, channels: list, chat_id: int) -> InlineKeyboardMarkup:
+    def create_subscription_keyboard(self, channels: list, chat_id: int,
+                                     lang: Optional[str] = None) -> InlineKeyboardMarkup:
         """
         Создает клавиатуру с кнопками подписки на каналы
+        lang - уже известный язык чата, чтобы не запрашивать его повторно
         """
+        lang = lang or language_service.get_chat_language(chat_id)
         keyboard = InlineKeyboardMarkup(row_width=1)
         
         for channel in channels:
             clean_channel = channel.lstrip('@')
-            button_text = language_service.get_text('subscribe_button', chat_id, channel=channel)
+            button_text = language_service.get_text_for_lang(lang, 'subscribe_button', channel=channel)
             button = InlineKeyboardButton(
                 text=button_text,
                 url=f"https://t.me/{clean_channel}"
@@ -105,7 +190,7 @@ class SubscriptionChecker:
             keyboard.add(button)
         
         # Кнопка с информацией о VIP
-        vip_button_text = language_service.get_text('vip_button', chat_id)
+        vip_button_text = language_service.get_text_for_lang(lang, 'vip_button')
         vip_button = InlineKeyboardButton(
             text=vip_button_text,
             callback_data="vip_info"
@@ -128,22 +213,15 @@ class SubscriptionChecker:
         if self.is_user_exempt(user_id, group_id):
             return
         
-        # Получаем активные каналы для этой группы
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT channel_username FROM channels 
-                WHERE group_id = ? AND is_active = 1 
-                AND (check_until IS NULL OR check_until > ?)
-            ''', (group_id, datetime.now()))
-            
-            channels = [row[0] for row in cursor.fetchall()]
+        # Получаем активные каналы для этой группы из снимка настроек
+        policy = group_policies.get(group_id)
+        channels, channel_ids = policy.get_active_channels()
         
         if not channels:
             return
         
         # Проверяем подписку
-        if not self.check_user_subscription(user_id, channels):
+        if not self.check_user_subscription(user_id, channels, channel_ids):
             try:
                 # Удаляем сообщение нарушителя
                 self.bot.delete_message(group_id, message.message_id)
@@ -155,43 +233,31 @@ class SubscriptionChecker:
             channels_text = ", ".join(channels)
             username = message.from_user.username or message.from_user.first_name
             
-            warning_text = language_service.get_text(
+            warning_text = language_service.get_text_for_lang(
+                policy.language,
                 'subscription_warning',
-                group_id,
                 username=username,
                 channels=channels_text
             )
             
             # Создаем клавиатуру
-            keyboard = self.create_subscription_keyboard(channels, group_id)
+            keyboard = self.create_subscription_keyboard(channels, group_id, policy.language)
             
             try:
-                # Отправляем предупреждение
-                sent_msg = self.bot.send_message(
-                    group_id,
-                    warning_text,
-                    reply_markup=keyboard,
-                    reply_to_message_id=message.message_id
-                )
+                # Отправляем предупреждение (низкий приоритет, при перегрузке отбрасывается)
+                with low_priority():
+                    sent_msg = self.bot.send_message(
+                        group_id,
+                        warning_text,
+                        reply_markup=keyboard,
+                        reply_to_message_id=message.message_id
+                    )
                 
                 # Проверяем автоудаление
-                with db.get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('SELECT auto_del_time FROM groups WHERE group_id = ?', (group_id,))
-                    result = cursor.fetchone()
-                    
-                    if result and result[0] > 0:
-                        auto_del_time = result[0]
-                        
-                        def delete_later():
-                            time.sleep(auto_del_time)
-                            try:
-                                self.bot.delete_message(group_id, sent_msg.message_id)
-                                logger.debug(f"Автоудаление сообщения через {auto_del_time}с")
-                            except Exception as e:
-                                logger.error(f"Ошибка автоудаления: {e}")
-                        
-                        threading.Thread(target=delete_later, daemon=True).start()
-                        
+                if policy.auto_del_time > 0:
+                    auto_delete_queue.schedule(group_id, sent_msg.message_id, policy.auto_del_time)
+            
+            except OutboundDropped:
+                logger.info(f"Предупреждение в группе {group_id} пропущено из-за лимита отправки")
             except Exception as e:
                 logger.error(f"Не удалось отправить предупреждение: {e}")
\ No newline at end of file
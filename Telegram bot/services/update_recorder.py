@@ -0,0 +1,290 @@
+import atexit
+import glob
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Optional, Union
+from telebot import apihelper
+from config import (
+    OWNER_ID,
+    UPDATE_RECORD_PATH,
+    UPDATE_RECORD_MAX_MB,
+    UPDATE_RECORD_BACKUPS,
+    UPDATE_RECORD_SALT
+)
+
+logger = logging.getLogger(__name__)
+
+# Постоянные ID в записи: воспроизведение подставляет вместо них своего бота и владельца
+SELF_ID = 0
+OWNER_PLACEHOLDER_ID = 1
+# Псевдонимы пользователей начинаются отсюда, чтобы не пересекаться с постоянными ID
+PSEUDONYM_BASE = 10 ** 9
+
+# Поля с текстом пользователя
+TEXT_FIELDS = frozenset({
+    'text', 'caption', 'query', 'phone_number', 'bio', 'vcard', 'question', 'explanation',
+    'forward_sender_name', 'forward_signature', 'author_signature'
+})
+# Поля с ID пользователя вне объекта User
+USER_ID_FIELDS = frozenset({'user_id', 'user_chat_id'})
+# callback_data, которые отправляют клавиатуры бота; остальные значения маскируются
+KNOWN_CALLBACK_DATA = frozenset({'vip_info'})
+# Точность координат после обезличивания (1 знак - около 10 км)
+LOCATION_DIGITS = 1
+
+class Anonymizer:
+    """
+    Заменяет ID и имена пользователей стабильными псевдонимами (HMAC с солью),
+    а текст - символами x той же длины. Команда в начале текста сохраняется.
+    Контакты маскируются, координаты округляются до LOCATION_DIGITS знаков
+    """
+
+    def __init__(self, salt: str, bot_id: Optional[int] = None):
+        self._key = salt.encode()
+        self.bot_id = bot_id
+
+    def user_id(self, user_id: int) -> int:
+        if user_id == self.bot_id:
+            return SELF_ID
+        if user_id == OWNER_ID:
+            return OWNER_PLACEHOLDER_ID
+        digest = hmac.new(self._key, str(user_id).encode(), hashlib.sha256).digest()
+        return PSEUDONYM_BASE + int.from_bytes(digest[:6], 'big') % PSEUDONYM_BASE
+
+    @staticmethod
+    def text(value: str) -> str:
+        command, separator, rest = value.partition(' ') if value.startswith('/') else ('', '', value)
+        return command + separator + ''.join(ch if ch.isspace() else 'x' for ch in rest)
+
+    @staticmethod
+    def location(obj: dict) -> dict:
+        """Только округленные координаты, без точности, направления и т.п."""
+        return {
+            'latitude': round(obj.get('latitude', 0.0), LOCATION_DIGITS),
+            'longitude': round(obj.get('longitude', 0.0), LOCATION_DIGITS)
+        }
+
+    def _contact(self, obj: dict) -> dict:
+        """Контакт: имя и телефон маскируются, user_id заменяется псевдонимом"""
+        result = {'phone_number': self.text(obj.get('phone_number', ''))}
+        pseudonym = self.user_id(obj['user_id']) if 'user_id' in obj else None
+        if pseudonym is not None:
+            result['user_id'] = pseudonym
+        for field in ('first_name', 'last_name'):
+            if field in obj:
+                result[field] = f'User {pseudonym}' if pseudonym is not None else self.text(obj[field])
+        return result
+
+    def _venue(self, obj: dict) -> dict:
+        return {
+            'location': self.location(obj.get('location', {})),
+            'title': self.text(obj.get('title', '')),
+            'address': self.text(obj.get('address', ''))
+        }
+
+    def _person(self, obj: dict) -> dict:
+        """Пользователь или личный чат"""
+        result = {field: self.anonymize(item, field) for field, item in obj.items()}
+        pseudonym = self.user_id(obj['id'])
+        result['id'] = pseudonym
+        for field in ('first_name', 'last_name'):
+            if field in obj:
+                result[field] = f'User {pseudonym}'
+        if obj.get('username'):
+            result['username'] = f'user{pseudonym}'
+        return result
+
+    def anonymize(self, value, key: Optional[str] = None):
+        if isinstance(value, list):
+            return [self.anonymize(item, key) for item in value]
+        
+        if isinstance(value, dict):
+            if key == 'contact':
+                return self._contact(value)
+            if key == 'venue':
+                return self._venue(value)
+            if key == 'location':
+                return self.location(value)
+            if 'id' in value and ('is_bot' in value or value.get('type') == 'private'):
+                return self._person(value)
+            return {field: self.anonymize(item, field) for field, item in value.items()}
+        
+        if isinstance(value, str):
+            if key in TEXT_FIELDS or (key == 'data' and value not in KNOWN_CALLBACK_DATA):
+                return self.text(value)
+            return value
+        if isinstance(value, int) and not isinstance(value, bool) and key in USER_ID_FIELDS:
+            return self.user_id(value)
+        return value
+
+class UpdateRecorder:
+    """
+    Записывает входящие обновления (polling и webhook) в сжатый JSONL
+    с ротацией по размеру. ID пользователей и тексты обезличиваются
+    """
+    _instance = None
+    _lock = threading.Lock()
+    # Как часто сбрасывать буфер gzip на диск
+    FLUSH_INTERVAL = 5  # секунд
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.path = UPDATE_RECORD_PATH
+        self.max_bytes = int(UPDATE_RECORD_MAX_MB * 1024 * 1024)
+        self.backups = UPDATE_RECORD_BACKUPS
+        self.anonymizer: Optional[Anonymizer] = None
+        self._file: Optional[gzip.GzipFile] = None
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._dirty = False
+        self._last_polled_id = 0
+        self._get_updates = None
+        self.recorded = 0
+        self.rotations = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def install(self, bot_id: Optional[int] = None):
+        """Включает запись, если задан UPDATE_RECORD_PATH"""
+        if not self.path or self.enabled:
+            return
+        
+        # Без постоянной соли псевдонимы разных запусков не совпадают и не восстанавливаются
+        self.anonymizer = Anonymizer(UPDATE_RECORD_SALT or secrets.token_hex(16), bot_id)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+        atexit.register(self.close)
+        # Буфер gzip сбрасывается и тогда, когда обновлений давно не было
+        threading.Thread(target=self._flush_loop, name='update-recorder-flush', daemon=True).start()
+        
+        # Polling: сырые обновления до разбора в Update
+        self._get_updates = apihelper.get_updates
+        apihelper.get_updates = self._polled
+        
+        # Webhook: обновления, принятые диспетчером
+        from services.webhook import update_queue
+        put = update_queue.put
+
+        def recording_put(raw: str) -> bool:
+            accepted = put(raw)
+            if accepted:
+                self.record(raw, 'webhook')
+            return accepted
+        
+        update_queue.put = recording_put
+        logger.info(f"📼 Запись обновлений включена: {self.path}")
+
+    def _polled(self, *args, **kwargs):
+        updates = self._get_updates(*args, **kwargs)
+        for raw in updates:
+            # check_existing_groups и polling могут получить одни и те же обновления
+            if raw.get('update_id', 0) > self._last_polled_id:
+                self._last_polled_id = raw['update_id']
+                self.record(raw, 'polling')
+        return updates
+
+    def record(self, raw: Union[str, dict], source: str):
+        """Обезличивает обновление и дописывает его в файл (ошибки записи не мешают боту)"""
+        try:
+            update = json.loads(raw) if isinstance(raw, str) else raw
+            line = json.dumps({
+                'ts': round(time.time(), 3),
+                'source': source,
+                'update': self.anonymizer.anonymize(update)
+            }, ensure_ascii=False) + '\n'
+            
+            with self._write_lock:
+                if self._file is None:
+                    return
+                self._file.write(line.encode('utf-8'))
+                self._dirty = True
+                self.recorded += 1
+                if self._file.fileobj.tell() >= self.max_bytes:
+                    self._rotate()
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Ошибка записи обновления: {e}")
+
+    def _open(self):
+        self._file = gzip.open(self.path, 'ab')
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            if self._file is not None and self._dirty:
+                try:
+                    self._file.flush()
+                    self._dirty = False
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Ошибка сброса записи обновлений: {e}")
+
+    def _rotate(self):
+        """Переименовывает текущий файл с отметкой времени и удаляет лишние старые"""
+        self._file.close()
+        
+        directory, name = os.path.split(self.path)
+        stem, dot, suffix = name.partition('.')
+        rotated = os.path.join(directory, f"{stem}-{datetime.now():%Y%m%d-%H%M%S-%f}{dot}{suffix}")
+        os.replace(self.path, rotated)
+        self.rotations += 1
+        
+        old_files = sorted(glob.glob(os.path.join(directory, f'{stem}-*{dot}{suffix}')))
+        for old in old_files[:max(0, len(old_files) - self.backups)]:
+            os.remove(old)
+        
+        self._open()
+        logger.info(f"📼 Файл записи обновлений ротирован: {rotated}")
+
+    def close(self):
+        self._stopped.set()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'path': self.path,
+            'recorded': self.recorded,
+            'rotations': self.rotations,
+            'errors': self.errors
+        }
+
+def read_recording(path: str):
+    """Читает записи из файла (в том числе дописанного после перезапуска)"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+# Глобальный экземпляр
+update_recorder = UpdateRecorder()
\ No newline at end of file
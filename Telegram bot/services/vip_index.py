@@ -0,0 +1,154 @@
+import threading
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Tuple
+from database import db
+from utils.time_parser import parse_db_timestamp
+
+logger = logging.getLogger(__name__)
+
+class VIPEntry:
+    """Одна запись из vip_users"""
+    __slots__ = ('id', 'username', 'vip_type', 'scope', 'group_id', 'end_date')
+
+    def __init__(self, id: int, username: str, vip_type: str, scope: str,
+                 group_id: Optional[int], end_date: Optional[datetime]):
+        self.id = id
+        self.username = username
+        self.vip_type = vip_type
+        self.scope = scope
+        self.group_id = group_id
+        self.end_date = end_date
+
+    def is_active(self, now: datetime) -> bool:
+        return self.end_date is None or self.end_date > now
+
+class VIPIndex:
+    """
+    Индекс VIP-прав в памяти: user_id -> записи пользователя.
+    Загружается из БД при первом обращении и обновляется из обработчиков vip_management.
+    Списки записей не изменяются на месте, поэтому чтение идет без блокировки
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._entries: Dict[int, Tuple[VIPEntry, ...]] = {}
+        self._loaded = False
+        self._write_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reload()
+
+    def reload(self):
+        """Перечитывает все VIP-записи из БД"""
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, user_id, username, vip_type, scope, group_id, end_date
+                FROM vip_users ORDER BY id
+            ''')
+            rows = cursor.fetchall()
+        
+        entries = {}
+        for row in rows:
+            entry = VIPEntry(row['id'], row['username'], row['vip_type'], row['scope'],
+                             row['group_id'], parse_db_timestamp(row['end_date']))
+            entries[row['user_id']] = entries.get(row['user_id'], ()) + (entry,)
+        
+        with self._write_lock:
+            self._entries = entries
+            self._loaded = True
+        logger.info(f"Индекс VIP загружен: {len(rows)} записей")
+
+    def add(self, row_id: int, user_id: int, username: str, vip_type: str, scope: str,
+            group_id: Optional[int] = None, end_date: Optional[datetime] = None):
+        """Добавляет запись после INSERT в vip_users"""
+        self._ensure_loaded()
+        entry = VIPEntry(row_id, username, vip_type, scope, group_id, end_date)
+        with self._write_lock:
+            self._entries[user_id] = self._entries.get(user_id, ()) + (entry,)
+
+    def remove(self, vip_type: str, username: Optional[str] = None):
+        """Удаляет записи типа vip_type (всех пользователей или только username)"""
+        self._ensure_loaded()
+        with self._write_lock:
+            for user_id, entries in list(self._entries.items()):
+                kept = tuple(
+                    entry for entry in entries
+                    if entry.vip_type != vip_type
+                    or (username is not None and entry.username != username)
+                )
+                self._set(user_id, entries, kept)
+
+    def remove_expired(self, now: Optional[datetime] = None):
+        """Удаляет истекшие записи (вызывается после очистки БД планировщиком)"""
+        if not self._loaded:
+            return
+        now = now or datetime.now()
+        with self._write_lock:
+            for user_id, entries in list(self._entries.items()):
+                kept = tuple(entry for entry in entries if entry.is_active(now))
+                self._set(user_id, entries, kept)
+
+    def _set(self, user_id: int, entries: tuple, kept: tuple):
+        if len(kept) == len(entries):
+            return
+        if kept:
+            self._entries[user_id] = kept
+        else:
+            del self._entries[user_id]
+
+    def get_vip_type(self, user_id: int, group_id: int) -> Optional[str]:
+        """Тип активной VIP-подписки пользователя в группе (глобальной или локальной)"""
+        self._ensure_loaded()
+        now = datetime.now()
+        for entry in self._entries.get(user_id, ()):
+            if (entry.scope == 'global' or entry.group_id == group_id) and entry.is_active(now):
+                return entry.vip_type
+        return None
+
+    def has_global_vip(self, user_id: int) -> bool:
+        """Есть ли у пользователя активный глобальный VIP"""
+        self._ensure_loaded()
+        now = datetime.now()
+        return any(
+            entry.scope == 'global' and entry.is_active(now)
+            for entry in self._entries.get(user_id, ())
+        )
+
+    def has_local_vip(self, user_id: int, group_id: int) -> bool:
+        """Есть ли у пользователя активный локальный VIP в группе"""
+        self._ensure_loaded()
+        now = datetime.now()
+        return any(
+            entry.scope == 'local' and entry.group_id == group_id and entry.is_active(now)
+            for entry in self._entries.get(user_id, ())
+        )
+
+    def count_local_groups(self, user_id: int, vip_type: str) -> int:
+        """Количество групп с активным локальным VIP типа vip_type"""
+        self._ensure_loaded()
+        now = datetime.now()
+        return len({
+            entry.group_id for entry in self._entries.get(user_id, ())
+            if entry.scope == 'local' and entry.vip_type == vip_type and entry.is_active(now)
+        })
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+# Глобальный экземпляр
+vip_index = VIPIndex()
\ No newline at end of file
@@ -1,8 +1,7 @@
 import logging
-from datetime import datetime
 from typing import Optional, List, Dict
-from database import db
 from config import VIP_FEATURES
+from services.vip_index import vip_index
 
 logger = logging.getLogger(__name__)
 
@@ -18,36 +17,16 @@ class VIPService:
         features = VIP_FEATURES.get(vip_type, {}).get('features', {})
         max_groups = features.get('max_groups', 1)
         
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT COUNT(DISTINCT group_id) FROM vip_users 
-                WHERE user_id = ? AND vip_type = ? AND scope = 'local'
-                AND (end_date IS NULL OR end_date > ?)
-            ''', (user_id, vip_type, datetime.now()))
-            
-            current_groups = cursor.fetchone()[0] or 0
-            
-            return current_groups < max_groups
+        current_groups = vip_index.count_local_groups(user_id, vip_type)
+        return current_groups < max_groups
 
     def get_vip_features(self, user_id: int, group_id: int) -> Dict:
         """Возвращает доступные функции для VIP пользователя"""
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT vip_type FROM vip_users 
-                WHERE user_id = ? AND (group_id = ? OR scope = 'global')
-                AND (end_date IS NULL OR end_date > ?)
-            ''', (user_id, group_id, datetime.now()))
-            
-            result = cursor.fetchone()
-            
-            if result:
-                vip_type = result['vip_type']
-                return VIP_FEATURES.get(vip_type, {}).get('features', {})
-            
-            return {}
+        vip_type = vip_index.get_vip_type(user_id, group_id)
+        if vip_type:
+            return VIP_FEATURES.get(vip_type, {}).get('features', {})
+        
+        return {}
 
     def has_immunity_to_mute(self, user_id: int, group_id: int) -> bool:
         """Проверяет, есть ли у пользователя иммунитет к мутам (VIP PLUS)"""
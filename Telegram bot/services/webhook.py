@@ -0,0 +1,71 @@
+import hmac
+import threading
+import logging
+from typing import Optional
+from telebot.types import Update
+from config import WEBHOOK_SECRET, WEBHOOK_QUEUE_SIZE
+from services.dispatcher import dispatcher
+
+logger = logging.getLogger(__name__)
+
+class UpdateQueue:
+    """
+    Прием обновлений через webhook.
+    Flask маршрут разбирает JSON и сразу кладет обновление в линию диспетчера,
+    не дожидаясь обработки. Очередью служат линии, их общий размер ограничен
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.accepted = 0
+        self.rejected = 0
+        self.invalid = 0
+
+    @staticmethod
+    def check_secret(token: Optional[str]) -> bool:
+        """Сверяет заголовок X-Telegram-Bot-Api-Secret-Token с WEBHOOK_SECRET (без секрета запросы отклоняются)"""
+        if not WEBHOOK_SECRET:
+            return False
+        return hmac.compare_digest(token or '', WEBHOOK_SECRET)
+
+    def put(self, raw: str) -> bool:
+        """
+        Передает сырое обновление диспетчеру.
+        Возвращает False, если линии заполнены (Telegram повторит доставку)
+        """
+        if dispatcher.pending() >= WEBHOOK_QUEUE_SIZE:
+            self.rejected += 1
+            return False
+        
+        try:
+            update = Update.de_json(raw)
+        except (ValueError, TypeError, KeyError) as e:
+            # Повторная доставка не исправит испорченное обновление
+            self.invalid += 1
+            logger.error(f"Не удалось разобрать обновление из webhook: {e}")
+            return True
+        
+        if not dispatcher.offer(update):
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def qsize(self) -> int:
+        """Количество обновлений, ожидающих обработки"""
+        return dispatcher.pending()
+
+# Глобальный экземпляр
+update_queue = UpdateQueue()
\ No newline at end of file
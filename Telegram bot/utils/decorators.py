@@ -1,6 +1,8 @@
 from functools import wraps
 from telebot.types import Message
 from config import OWNER_ID
+from services.admin_cache import admin_cache
+from services.outbound import outbound, PRIORITY_HIGH
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,7 +12,9 @@ def owner_only(func):
     @wraps(func)
     def wrapper(message: Message, *args, **kwargs):
         if message.from_user.id == OWNER_ID:
-            return func(message, *args, **kwargs)
+            # Ответы владельцу отправляются раньше остальных запросов
+            with outbound.priority(PRIORITY_HIGH):
+                return func(message, *args, **kwargs)
         else:
             logger.warning(f"⚠️ Попытка доступа к команде {message.text} от {message.from_user.id}")
             return None
@@ -47,8 +51,7 @@ def admin_only(func):
             
             # Проверяем, является ли пользователь администратором группы
             if message.chat.type in ['group', 'supergroup']:
-                member = bot.get_chat_member(message.chat.id, message.from_user.id)
-                if member.status in ['administrator', 'creator']:
+                if admin_cache.is_admin(bot, message.chat.id, message.from_user.id):
                     return func(message, *args, **kwargs)
             
             bot.reply_to(message, "❌ Эта команда доступна только администраторам группы")
@@ -19,6 +19,15 @@ def get_group_id_by_username(bot, group_username):
     except:
         return None
 
+def get_channel_id_by_username(bot, channel_username):
+    """Получает числовой ID канала по username"""
+    try:
+        channel_username = channel_username.replace('@', '')
+        channel = bot.get_chat(f"@{channel_username}")
+        return channel.id
+    except:
+        return None
+
 def get_selected_group(owner_id):
     """Получает выбранную группу для owner"""
     with db.get_connection() as conn:
@@ -1,6 +1,6 @@
 import re
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 
 def parse_time_string(time_str: str) -> Optional[int]:
     """
@@ -56,4 +56,15 @@ def parse_duration_to_end(duration: str) -> Optional[datetime]:
 
 def format_datetime(dt: datetime) -> str:
     """Форматирует дату и время для отображения"""
-    return dt.strftime('%d.%m.%Y %H:%M:%S')
\ No newline at end of file
+    return dt.strftime('%d.%m.%Y %H:%M:%S')
+
+def parse_db_timestamp(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """
+    Преобразует TIMESTAMP из SQLite (строка ISO или datetime) в datetime
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
\ No newline at end of file